@@ -1,16 +1,38 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request
+import time
+import uuid
+from startup import finish_startup, init_template_cache  # primero: marca el inicio de los imports
+from flask import Flask, render_template, redirect, url_for, request, jsonify, abort, get_flashed_messages
 from flask_login import LoginManager, current_user
-from models import db, User, Producto, Categoria
-from cart_utils import (
-    cart_items,
-    cart_total,
-)  # no dependemos de cart_qty para evitar errores
+from markupsafe import Markup
+from models import db, Producto, Categoria
+from catalog import (
+    home_shelves, search_products, category_by_slug, category_page, category_filters,
+    price_bucket, CATEGORY_SORTS,
+)
+from catalog_cache import cached, init_catalog_cache
+from catalog_stats import init_catalog_stats
+from suggest import init_suggest, suggest_index
+from database import init_database
+from metrics import init_metrics
+from passwords import init_passwords
+from identity import init_identity
+from cart_utils import cart_qty, init_cart_store
+from pricing import priced_cart
+from http_cache import conditional, init_http_cache
+from images import init_images
+from uploads import init_uploads
+from assets import init_assets
+from prerender import init_prerender, is_prerendering
+from commands import register_commands
 
 
 def create_app():
+    init_started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object("config")
+    # Bytecode de Jinja en disco + warm-up al final (ver startup.py)
+    init_template_cache(app)
 
     # === Config Admin por email ===
     app.config.setdefault("ADMIN_EMAILS", {"admin@faigothy.com"})
@@ -21,102 +43,183 @@ def create_app():
         "ALLOWED_EXTENSIONS", {"png", "jpg", "jpeg", "gif", "webp", "avif"}
     )
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    init_images(app)
+    # Guardadas por hash de contenido, con MAX_CONTENT_LENGTH (ver uploads.py)
+    init_uploads(app)
 
-    # === DB ===
+    # === Assets con hash (static_dist/manifest.json, ver assets.py) ===
+    init_assets(app)
+    init_passwords(app)
+
+    # === Búsqueda ===
+    app.config.setdefault("SEARCH_PAGE_SIZE", 24)
+    app.config.setdefault("ADMIN_PAGE_SIZE", 50)
+    app.config.setdefault("CATEGORY_PAGE_SIZE", 48)
+
+    # === DB (pragmas SQLite + migraciones, ver database.py) ===
     db.init_app(app)
+    init_database(app)
+    # Tiempos por endpoint, SQL y templates (ver metrics.py, /admin/metrics)
+    init_metrics(app)
+
+    # === Caché del catálogo ===
+    init_catalog_cache(app)
+    # Estadísticas del dashboard mantenidas al escribir (ver catalog_stats.py)
+    init_catalog_stats(app)
+    # Índice de sugerencias del buscador, armado al arrancar
+    init_suggest(app)
+
+    # === Carrito (store server-side; la cookie solo lleva el id) ===
+    init_cart_store(app)
+
+    # === ETag/304 en páginas públicas (ver http_cache.py) ===
+    init_http_cache(app)
+    # HTML estático del home y las categorías (ver prerender.py)
+    init_prerender(app)
 
     # === Login manager ===
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # user_loader cacheado por proceso (ver identity.py)
+    init_identity(app, login_manager)
 
     # === Variables disponibles en todos los templates ===
     @app.context_processor
     def inject_globals():
+        # Resumen mantenido por el store: no recorre las líneas del carrito
         try:
-            items = cart_items()
-            cart_qty = sum((v.get("qty", 0) for v in items.values()))
+            qty = cart_qty()
         except Exception:
-            cart_qty = 0
-
-        admin_emails = app.config.get("ADMIN_EMAILS", set())
-        is_admin = bool(
-            current_user.is_authenticated and current_user.email in admin_emails
-        )
+            qty = 0
 
         return {
             "SITE_TITLE": "FAIGOTHY ✶ accesorios hechos a mano",
-            "CART_QTY": cart_qty,
-            "IS_ADMIN": is_admin,
+            "CART_QTY": qty,
+            # Calculado al armar la identidad, no en cada render
+            "IS_ADMIN": current_user.is_admin,
+            # Página estática: lo del visitante lo completa app.js (/hydrate)
+            "PRERENDER": is_prerendering(),
         }
 
     # === Blueprints ===
     from routes.cart import cart_bp
     from routes.auth import auth_bp
     from routes.admin import admin_bp
+    from routes.orders import orders_bp
 
     app.register_blueprint(cart_bp, url_prefix="/carrito")
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    app.register_blueprint(orders_bp, url_prefix="/pedidos")
+
+    # === CLI ===
+    register_commands(app)
 
     # === Rutas ===
     @app.route("/", endpoint="index")
+    @conditional
     def index():
-        latest_products = (
-            Producto.query.filter_by(activo=True)
-            .order_by(Producto.id.desc())
-            .limit(24)
-            .all()
-        )
+        # Los estantes (novedades + carruseles) se renderizan una vez por
+        # versión del catálogo; el admin invalida al modificar productos.
+        shelves_html = cached("home_shelves", _render_home_shelves)
+        return render_template("index.html", shelves_html=shelves_html)
 
-        slugs = [
-            "accesorios-pelo",
-            "aros",
-            "anillos",
-            "cinturones",
-            "collares",
-            "prendas",
-        ]
-        cats = {
-            c.slug: c for c in Categoria.query.filter(Categoria.slug.in_(slugs)).all()
-        }
-        productos_by_cat = {}
-        for slug in slugs:
-            cat = cats.get(slug)
-            productos_by_cat[slug] = (
-                Producto.query.filter_by(categoria_id=cat.id, activo=True)
-                .order_by(Producto.id.desc())
-                .limit(12)
-                .all()
-                if cat
-                else []
+    def _render_home_shelves():
+        latest_products, productos_by_cat = home_shelves()
+        return Markup(
+            render_template(
+                "partials/home_shelves.html",
+                latest_products=latest_products,
+                productos_by_cat=productos_by_cat,
             )
+        )
 
+    @app.route("/categoria/<slug>", endpoint="category")
+    @conditional
+    def category(slug):
+        categoria = category_by_slug(slug)
+        if categoria is None:
+            abort(404)
+        sort = request.args.get("orden", "nuevos")
+        if sort not in CATEGORY_SORTS:
+            sort = "nuevos"
+        bucket = price_bucket(request.args.get("precio", ""))
+
+        # Orden + rango + cursor sobre índices compuestos (ver catalog.py)
+        productos, next_cursor = category_page(
+            categoria.id,
+            app.config["CATEGORY_PAGE_SIZE"],
+            sort=sort,
+            bucket=bucket,
+            cursor=request.args.get("after"),
+        )
         return render_template(
-            "index.html",
-            latest_products=latest_products,
-            productos_by_cat=productos_by_cat,
+            "category.html",
+            categoria=categoria,
+            productos=productos,
+            next_cursor=next_cursor,
+            is_first_page=not request.args.get("after"),
+            sort=sort,
+            sorts=CATEGORY_SORTS,
+            bucket=bucket,
+            # Conteos precalculados por versión del catálogo
+            filtros=category_filters(categoria.id, bucket),
+        )
+
+    # Lo que el HTML pre-renderizado no trae: carrito, sesión y flashes
+    @app.route("/hydrate", endpoint="hydrate")
+    def hydrate():
+        response = jsonify(
+            {
+                "qty": cart_qty(),
+                "user": current_user.is_authenticated,
+                "admin": current_user.is_admin,
+                "flashes": get_flashed_messages(with_categories=True),
+            }
         )
+        response.cache_control.no_store = True
+        return response
 
     # === NUEVA RUTA DE BÚSQUEDA ===
     @app.route("/search", endpoint="search")
+    @conditional
     def search():
         query = request.args.get("q", "").strip()
         if not query:
             return redirect(url_for("index"))
 
-        # Buscar productos activos por nombre o descripción
-        results = Producto.query.filter(
-            Producto.activo == True,
-            (Producto.nombre.ilike(f"%{query}%"))
-            | (Producto.descripcion.ilike(f"%{query}%")),
-        ).all()
+        # Índice FTS5 (bm25, prefijos, sin acentos) paginado por cursor
+        results, next_cursor = search_products(
+            query,
+            limit=app.config["SEARCH_PAGE_SIZE"],
+            cursor=request.args.get("after"),
+        )
 
-        return render_template("search_results.html", results=results, query=query)
+        return render_template(
+            "search_results.html",
+            results=results,
+            query=query,
+            next_cursor=next_cursor,
+            is_first_page=not request.args.get("after"),
+        )
+
+    # Sugerencias mientras se escribe: índice en memoria (ver suggest.py)
+    @app.route("/search/suggest", endpoint="search_suggest")
+    def search_suggest():
+        found = suggest_index.suggest(request.args.get("q", ""), app.config["SUGGEST_LIMIT"])
+        return jsonify(
+            {
+                "categorias": [
+                    {"nombre": nombre, "url": url_for("category", slug=slug) if slug else url_for("search", q=nombre)}
+                    for nombre, slug in found["categorias"]
+                ],
+                "productos": [
+                    {"nombre": nombre, "url": url_for("search", q=nombre)}
+                    for _, nombre in found["productos"]
+                ],
+            }
+        )
 
     @app.route("/checkout")
     def checkout():
@@ -124,9 +227,16 @@ def create_app():
             if request.args.get("partial"):
                 return render_template("partials/login_form.html")
             return redirect(url_for("auth.login"))
-        items = cart_items()
-        total = cart_total()
-        return render_template("checkout.html", items=items, total=total)
+        # Precios revalidados contra el catálogo (una consulta, Decimal)
+        priced = priced_cart()
+        # Clave de idempotencia del submit: un reintento no duplica el pedido
+        return render_template(
+            "checkout.html",
+            items=priced.items,
+            total=priced.total,
+            issues=priced.issues,
+            idempotency_key=uuid.uuid4().hex,
+        )
 
     # Aliases por conveniencia
     @app.route("/login")
@@ -137,6 +247,7 @@ def create_app():
     def register_alias():
         return redirect(url_for("auth.register"))
 
+    finish_startup(app, init_started)
     return app
 
 
@@ -0,0 +1,311 @@
+"""Modo ASGI: la misma app Flask, con las lecturas calientes en async.
+
+Uso:
+    uvicorn --factory asgi:create_asgi_app --port 8000
+
+Flask sigue atendiendo todo (blueprints, templates, sesiones) dentro de un
+pool de hilos acotado (ASGI_WSGI_THREADS). Delante hay una capa async que
+responde sin ocupar un hilo, con un engine SQLAlchemy async (aiosqlite):
+
+- GET /carrito/qty y GET /carrito/state?since=<rev> sin cambios: lo que los
+  clientes consultan en loop (polling del badge / panel).
+- Revalidaciones de páginas del catálogo (@conditional en http_cache.py):
+  si el If-None-Match coincide se responde 304 sin renderizar.
+
+Si la capa async no puede decidir (otro backend de base o de carrito,
+mensajes flash pendientes, cookie remember de flask_login, ETag que no
+coincide...) el request pasa a Flask tal cual.
+
+Pendiente: el render del catálogo y de la búsqueda (/, /categoria/<slug>,
+/search con 200) no es async. Esas páginas siguen renderizándose en Flask
+y ocupan un hilo del pool; la capa async solo les ahorra el hilo cuando
+alcanza con un 304. Para las páginas del catálogo que ven los anónimos,
+la alternativa sin hilo es el pre-render estático (ver prerender.py).
+"""
+import asyncio
+import json
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+from sqlalchemy import event, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_cookie
+from app import create_app
+from database import pragma_listener
+from http_cache import cache_control_for, make_etag, viewer_key
+from routes.cart import revision_token
+
+
+# ----------------- Flask en un pool de hilos -----------------
+def _environ(scope, body):
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "SERVER_NAME": (scope.get("server") or ("localhost", 80))[0],
+        "SERVER_PORT": str((scope.get("server") or ("localhost", 80))[1]),
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # El cuerpo ya está entero en el archivo: sirve también sin Content-Length (chunked)
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope["headers"]:
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = "HTTP_" + name
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class WsgiBridge:
+    """Adaptador ASGI -> WSGI; cada request corre en un hilo del pool.
+
+    El cuerpo se recibe en un SpooledTemporaryFile (en disco pasado
+    ``spool_size``) y se corta en ``max_content_length``. El hilo manda los chunks de la respuesta con ``send`` y espera a que
+    salgan, así las respuestas en streaming tienen backpressure.
+    """
+
+    def __init__(self, wsgi_app, threads, max_content_length=None, spool_size=1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.max_content_length = max_content_length
+        self.spool_size = spool_size
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    async def _read_body(self, scope, receive):
+        """Cuerpo del request en un archivo temporal; (archivo, tamaño).
+
+        Pasado MAX_CONTENT_LENGTH se deja de leer: el archivo queda vacío y
+        el tamaño es el declarado (o lo recibido hasta ahí), así Flask
+        responde su 413 (el del admin redirige con un flash) sin que el
+        cuerpo entero pase por memoria ni por disco.
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        limit = self.max_content_length
+        declared = dict(scope["headers"]).get(b"content-length")
+        if limit is not None and declared is not None and declared.isdigit() and int(declared) > limit:
+            return body, int(declared)
+        size = 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if limit is not None and size > limit:
+                body.seek(0)
+                body.truncate()
+                return body, size
+            body.write(chunk)
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+        return body, None
+
+    async def __call__(self, scope, receive, send):
+        body, too_large = await self._read_body(scope, receive)
+        environ = _environ(scope, body)
+        if too_large is not None:
+            # Werkzeug compara Content-Length con el máximo solo si el input no
+            # está "terminado" y no es chunked (el cuerpo ya no lo es acá)
+            environ["CONTENT_LENGTH"] = str(too_large)
+            environ["wsgi.input_terminated"] = False
+            environ.pop("HTTP_TRANSFER_ENCODING", None)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._run, environ, send, loop)
+        finally:
+            body.close()
+
+    def _run(self, environ, send, loop):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        pending = {}
+
+        def start_response(status, headers, exc_info=None):
+            pending["start"] = {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            }
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if not chunk:
+                    continue
+                if "start" in pending:
+                    emit(pending.pop("start"))
+                emit({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        if "start" in pending:
+            emit(pending.pop("start"))
+        emit({"type": "http.response.body", "body": b"", "more_body": False})
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# ----------------- Lecturas async -----------------
+class AsyncReads:
+    """Respuestas que no necesitan Flask, con un engine aiosqlite propio."""
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self.config = flask_app.config
+        url = make_url(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+        self.enabled = url.get_backend_name() == "sqlite" and flask_app.config.get("CART_BACKEND") == "sqlite"
+        self.engine = None
+        if self.enabled:
+            self.engine = create_async_engine(url.set(drivername="sqlite+aiosqlite"))
+            if flask_app.config.get("SQLITE_PRAGMAS"):
+                event.listen(
+                    self.engine.sync_engine, "connect", pragma_listener(flask_app.config["SQLITE_PRAGMAS"])
+                )
+        self.serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.urls = flask_app.url_map.bind("localhost")
+        self.qty_path = self.urls.build("cart.qty")
+        self.state_path = self.urls.build("cart.state")
+
+    def _session(self, headers):
+        cookies = parse_cookie(headers.get(b"cookie", b"").decode("latin-1"))
+        if cookies.get(self.config.get("REMEMBER_COOKIE_NAME", "remember_token")):
+            return None  # flask_login restauraría la sesión: que decida Flask
+        raw = cookies.get(self.config["SESSION_COOKIE_NAME"])
+        if not raw:
+            return {}
+        try:
+            return self.serializer.loads(raw, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return None
+
+    async def _lookup(self, cart_id, user_id):
+        # Una sola ida a la base para todo lo que cambia por visitante
+        async with self.engine.connect() as conn:
+            row = (
+                await conn.execute(
+                    text(
+                        "SELECT (SELECT version FROM catalog_version WHERE id = 1),"
+                        " (SELECT qty FROM carts WHERE id = :cart),"
+                        " (SELECT revision FROM carts WHERE id = :cart),"
+                        " (SELECT email FROM users WHERE id = :user)"
+                    ),
+                    {"cart": cart_id, "user": user_id},
+                )
+            ).first()
+        version, qty, revision, email = row
+        return version or 0, qty or 0, revision or 0, email
+
+    async def handle(self, scope):
+        """Devuelve (status, headers, body) o None para pasarle el request a Flask."""
+        if not self.enabled or scope["method"] not in ("GET", "HEAD"):
+            return None
+        headers = dict(scope["headers"])
+        session = self._session(headers)
+        if session is None or "_flashes" in session:
+            return None
+        path = scope["path"]
+        cart_id = session.get("cart_id")
+        user_id = session.get("_user_id")
+
+        if path == self.qty_path:
+            _, qty, _, _ = await self._lookup(cart_id, user_id)
+            return 200, [(b"content-type", b"application/json")], json.dumps({"qty": qty}).encode() + b"\n"
+
+        if path == self.state_path:
+            since = dict(parse_qsl(scope["query_string"].decode("latin-1"))).get("since")
+            if not since:
+                return None
+            version, qty, revision, _ = await self._lookup(cart_id, user_id)
+            token = revision_token(revision, version)
+            if since != token:
+                return None
+            payload = {"ok": True, "qty": qty, "revision": token, "unchanged": True}
+            return 200, [(b"content-type", b"application/json")], json.dumps(payload).encode() + b"\n"
+
+        if_none_match = headers.get(b"if-none-match")
+        if not if_none_match or not self.config.get("HTTP_CACHE_ENABLED"):
+            return None
+        try:
+            endpoint, _ = self.urls.match(path, method="GET")
+        except HTTPException:
+            return None
+        if not getattr(self.app.view_functions.get(endpoint), "conditional", False):
+            return None
+        version, qty, _, email = await self._lookup(cart_id, user_id)
+        if user_id is not None and email is None:
+            return None
+        viewer = viewer_key(user_id, email in self.config.get("ADMIN_EMAILS", set()))
+        full_path = f"{path}?{scope['query_string'].decode('latin-1')}"
+        etag = make_etag(self.config, version, full_path, viewer, qty)
+        tags = [t.strip().removeprefix("W/").strip('"') for t in if_none_match.decode("latin-1").split(",")]
+        if etag not in tags:
+            return None
+        return 304, [
+            (b"etag", f'"{etag}"'.encode()),
+            (b"cache-control", cache_control_for(self.config, viewer, qty).encode()),
+            (b"vary", b"Cookie"),
+        ], b""
+
+    async def close(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+# ----------------- App ASGI -----------------
+class AsgiApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.reads = AsyncReads(flask_app)
+        self.wsgi = WsgiBridge(
+            flask_app,
+            flask_app.config["ASGI_WSGI_THREADS"],
+            max_content_length=flask_app.config.get("MAX_CONTENT_LENGTH"),
+            spool_size=flask_app.config["ASGI_SPOOL_MAX_SIZE"],
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return None
+        response = await self.reads.handle(scope)
+        if response is None:
+            return await self.wsgi(scope, receive, send)
+        status, headers, body = response
+        if status != 304:
+            headers = headers + [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.reads.close()
+                self.wsgi.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(flask_app=None):
+    flask_app = flask_app or create_app()
+    flask_app.config.setdefault("ASGI_WSGI_THREADS", 8)
+    # Cuerpos de request más grandes que esto pasan de memoria a disco
+    flask_app.config.setdefault("ASGI_SPOOL_MAX_SIZE", 1024 * 1024)
+    return AsgiApp(flask_app)
@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import time
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:  # opcional: sin el paquete brotli solo se generan variantes .gz
+    import brotli
+except ImportError:
+    brotli = None
+
+# Assets con huella de contenido. `flask --app app build-assets` copia cada
+# archivo de static/ a static_dist/ como nombre.<hash>.ext, junto con sus
+# variantes .gz/.br, y escribe manifest.json. Con el manifiesto cargado,
+# url_for('static', ...) resuelve al nombre con hash y esos archivos se sirven
+# precomprimidos con Cache-Control immutable: un deploy solo invalida lo que
+# cambió. Lo que no está en el manifiesto (p. ej. uploads nuevos) se sirve
+# como siempre.
+#
+# Cada build escribe al lado de los anteriores (no borra static_dist/): el
+# HTML cacheado (304/s-maxage, páginas pre-renderizadas, CDN) y los workers
+# que todavía no reiniciaron siguen pidiendo los nombres con hash viejos. El
+# manifiesto de cada build queda en manifests/ y `flask prune-assets` borra
+# solo lo que no usa ninguno de los últimos N builds.
+
+MANIFEST_NAME = "manifest.json"
+GENERATIONS_DIR = "manifests"  # un manifiesto por build, para prune_assets
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = {".js", ".css", ".svg", ".json", ".txt", ".html", ".ico", ".map"}
+MIN_COMPRESS_SIZE = 256
+# Generados en runtime; no tiene sentido fijarlos en el manifiesto
+SKIP_DIRS = {"img/derivatives"}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(filename, digest):
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{ext}"
+
+
+def _static_files(static_folder):
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder).replace(os.sep, "/")
+        dirs[:] = [
+            d for d in dirs
+            if not d.startswith(".") and (d if rel_root == "." else f"{rel_root}/{d}") not in SKIP_DIRS
+        ]
+        for name in sorted(files):
+            if not name.startswith("."):
+                yield os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+
+
+def build_assets(static_folder, dist_folder):
+    """Agrega el build a static_dist/ y devuelve el manifiesto {original: con_hash}."""
+    manifest = {}
+    for filename in _static_files(static_folder):
+        src = os.path.join(static_folder, filename)
+        hashed = _hashed_name(filename, _file_hash(src))
+        manifest[filename] = hashed
+        dest = os.path.join(dist_folder, hashed)
+        if os.path.exists(dest):
+            continue  # mismo hash = mismo contenido, de un build anterior
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copy2(src, dest)
+
+        if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE:
+            continue
+        with open(src, "rb") as fh:
+            data = fh.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            continue
+        with open(dest + ".gz", "wb") as fh:
+            fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(dest + ".br", "wb") as fh:
+                fh.write(brotli.compress(data, quality=11))
+
+    os.makedirs(os.path.join(dist_folder, GENERATIONS_DIR), exist_ok=True)
+    generation = os.path.join(dist_folder, GENERATIONS_DIR, f"{time.time_ns()}.json")
+    with open(generation, "w") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    # El manifiesto vigente se reemplaza atómico: un worker que arranca
+    # nunca lee uno a medio escribir
+    tmp = os.path.join(dist_folder, f".{MANIFEST_NAME}.tmp")
+    shutil.copyfile(generation, tmp)
+    os.replace(tmp, os.path.join(dist_folder, MANIFEST_NAME))
+    return manifest
+
+
+def prune_assets(dist_folder, keep=3):
+    """Borra los archivos que no usa ninguno de los últimos ``keep`` builds.
+
+    Devuelve la lista de rutas borradas (relativas a ``dist_folder``).
+    """
+    generations_dir = os.path.join(dist_folder, GENERATIONS_DIR)
+    if not os.path.isdir(generations_dir):
+        return []
+    generations = sorted(
+        (name for name in os.listdir(generations_dir) if name.endswith(".json")),
+        key=lambda name: int(name.split(".")[0]),
+    )
+    kept, old = generations[-keep:], generations[:-keep]
+    if not kept:
+        return []
+    live = set(load_manifest(dist_folder).values())
+    for name in kept:
+        with open(os.path.join(generations_dir, name)) as fh:
+            live.update(json.load(fh).values())
+
+    removed = []
+    for root, dirs, files in os.walk(dist_folder, topdown=False):
+        rel_root = os.path.relpath(root, dist_folder).replace(os.sep, "/")
+        if rel_root == GENERATIONS_DIR:
+            continue
+        for name in files:
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            if rel == MANIFEST_NAME or rel.startswith("."):
+                continue
+            base, ext = os.path.splitext(rel)
+            if (base if ext in (".gz", ".br") else rel) not in live:
+                os.remove(os.path.join(root, name))
+                removed.append(rel)
+        if rel_root != "." and not os.listdir(root):
+            os.rmdir(root)
+    for name in old:
+        os.remove(os.path.join(generations_dir, name))
+    return removed
+
+
+def load_manifest(dist_folder):
+    try:
+        with open(os.path.join(dist_folder, MANIFEST_NAME)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_assets(app):
+    app.config.setdefault("ASSET_DIST_FOLDER", os.path.join(app.root_path, "static_dist"))
+    app.config.setdefault("ASSET_MANIFEST", True)
+    manifest = load_manifest(app.config["ASSET_DIST_FOLDER"]) if app.config["ASSET_MANIFEST"] else {}
+    hashed_files = set(manifest.values())
+    app.extensions["asset_manifest"] = manifest
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = manifest.get(values["filename"], values["filename"])
+
+    default_static = app.view_functions["static"]
+    dist_folder = app.config["ASSET_DIST_FOLDER"]
+
+    def static(filename):
+        # Nombres con hash de builds anteriores (HTML cacheado) también
+        if filename not in hashed_files:
+            path = safe_join(dist_folder, filename)
+            internal = filename == MANIFEST_NAME or filename.startswith(GENERATIONS_DIR + "/")
+            if internal or path is None or not os.path.isfile(path):
+                return default_static(filename=filename)
+        accepted = request.accept_encodings
+        path = os.path.join(dist_folder, filename)
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if accepted[encoding] and os.path.exists(path + suffix):
+                response = send_from_directory(
+                    dist_folder, filename + suffix, max_age=IMMUTABLE_MAX_AGE
+                )
+                response.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(dist_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+        response.vary.add("Accept-Encoding")
+        return response
+
+    app.view_functions["static"] = static
+
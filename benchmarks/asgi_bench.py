@@ -0,0 +1,159 @@
+"""Benchmark de concurrencia: modo sync (todo en el pool de hilos) vs. ASGI.
+
+Uso:
+    python benchmarks/asgi_bench.py                  # 10, 100 y 400 clientes, 5s cada uno
+    python benchmarks/asgi_bench.py 50 500 --seconds 10
+
+Levanta uvicorn sobre una base SQLite temporal dos veces: "sync" sirve todo
+con el puente WSGI de asgi.py (equivale a un worker con ASGI_WSGI_THREADS
+hilos) y "asgi" agrega las lecturas async. Cada cliente simula una pestaña
+abierta: consulta /carrito/qty, /carrito/state?since= y revalida / con
+If-None-Match, en loop, desde un proceso aparte. Necesita httpx (solo
+para preparar la sesión).
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_bench import BUYER, seed  # noqa: E402  (también fija DATABASE_URL a una base temporal)
+
+import random  # noqa: E402
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from app import create_app  # noqa: E402
+from asgi import WsgiBridge, create_asgi_app  # noqa: E402
+
+PRODUCTS = 2000
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(asgi_app, lifespan):
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning", lifespan=lifespan)
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("uvicorn no pudo arrancar")
+        time.sleep(0.05)
+    return server, thread, port
+
+
+async def prepare_session(port, product_id):
+    """Cookie de sesión con carrito + revisión y ETag vigentes."""
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        await client.post("/auth/login", data={"email": BUYER[0], "password": BUYER[1]})
+        await client.post(f"/carrito/add/{product_id}", headers={"X-Requested-With": "fetch"})
+        await client.get("/")  # consume el flash de bienvenida
+        state = (await client.get("/carrito/state")).json()
+        etag = (await client.get("/")).headers["etag"]
+        cookie = "; ".join(f"{k}={v}" for k, v in client.cookies.items())
+        return cookie, state["revision"], etag
+
+
+async def _get(reader, writer, host, path, headers):
+    lines = [f"GET {path} HTTP/1.1", f"Host: {host}"] + [f"{k}: {v}" for k, v in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    fields = dict(
+        line.split(b":", 1) for line in head.split(b"\r\n")[1:] if b":" in line
+    )
+    fields = {k.strip().lower(): v.strip() for k, v in fields.items()}
+    if b"content-length" in fields:
+        await reader.readexactly(int(fields[b"content-length"]))
+    elif fields.get(b"transfer-encoding") == b"chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+async def tab(port, cookie, revision, etag, deadline, samples, statuses):
+    # Cliente HTTP/1.1 mínimo con keep-alive: httpx se comía la CPU del benchmark
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    host = f"127.0.0.1:{port}"
+    requests = [
+        ("/carrito/qty", {"Cookie": cookie}),
+        (f"/carrito/state?since={revision}", {"Cookie": cookie}),
+        ("/", {"Cookie": cookie, "If-None-Match": etag}),
+    ]
+    i = 0
+    while time.perf_counter() < deadline:
+        path, headers = requests[i % len(requests)]
+        i += 1
+        t0 = time.perf_counter()
+        status = await _get(reader, writer, host, path, headers)
+        samples.append((time.perf_counter() - t0) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+
+async def _load(port, clients, seconds, session):
+    samples, statuses = [], {}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(tab(port, *session, deadline, samples, statuses) for _ in range(clients)))
+    samples.sort()
+    pct = lambda p: samples[min(len(samples) - 1, int(len(samples) * p / 100))]  # noqa: E731
+    return len(samples) / seconds, pct(50), pct(95), pct(99), statuses
+
+
+def run_load(port, clients, seconds, session):
+    return asyncio.run(_load(port, clients, seconds, session))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clients", nargs="*", type=int, default=[10, 100, 400])
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    flask_app = create_app()
+    flask_app.config["IMAGE_DERIVATIVES"] = False
+    with flask_app.app_context():
+        product_ids = seed(PRODUCTS, random.Random(1))
+
+    asgi_app = create_asgi_app(flask_app)
+    modes = [
+        # el puente solo no implementa lifespan
+        ("sync", WsgiBridge(flask_app, flask_app.config["ASGI_WSGI_THREADS"]), "off"),
+        ("asgi", asgi_app, "on"),
+    ]
+    print(f"{PRODUCTS} productos, {flask_app.config['ASGI_WSGI_THREADS']} hilos para Flask, {args.seconds:.0f}s por corrida")
+    print(f"{'modo':<6}{'clientes':>9}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}  estados")
+    loadgen = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+    for name, app, lifespan in modes:
+        server, thread, port = serve(app, lifespan)
+        session = asyncio.run(prepare_session(port, product_ids[0]))
+        for clients in args.clients:
+            # Los clientes corren en otro proceso para no competir por el GIL del servidor
+            rps, p50, p95, p99, statuses = loadgen.submit(
+                run_load, port, clients, args.seconds, session
+            ).result()
+            print(f"{name:<6}{clients:>9}{rps:>9.0f}{p50:>8.1f}ms{p95:>8.1f}ms{p99:>8.1f}ms  {statuses}")
+        server.should_exit = True
+        thread.join()
+    loadgen.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Prueba de concurrencia del checkout: muchos compradores, un solo SKU.
+
+Uso:
+    python benchmarks/checkout_stress.py                    # 32 hilos, stock 50
+    python benchmarks/checkout_stress.py --max-p95 2500     # runner de 1 CPU
+    python benchmarks/checkout_stress.py --threads 64 --stock 20 --attempts 5 --max-p95 300
+
+Crea un producto con stock limitado y N compradores (cada hilo con su
+propio test client y su sesión). Cada intento agrega el SKU al carrito,
+abre /checkout (clave de idempotencia + total) y confirma; a veces manda el
+mismo submit dos veces a la vez, como un doble click. La demanda total
+supera el stock.
+
+Verifica al final y sale con código 1 si algo falla:
+- no hay sobreventa: vendidas == stock inicial - stock final, nunca más que
+  el stock inicial, y el stock no queda negativo;
+- cada pedido creado tiene sus líneas y los reintentos con la misma clave
+  devolvieron el mismo pedido (no hay pedidos duplicados);
+- p95 de la confirmación por debajo de --max-p95 (ms).
+
+El default de --max-p95 (1000 ms) es el límite real de la confirmación en
+una máquina dimensionada. En runners lentos o compartidos hay que pasarlo
+más alto: con 32 hilos en 1 CPU la cola depende de las esperas del busy
+handler de SQLite y el p95 medido va de 650 a 2000 ms, así que ahí se
+corre con --max-p95 2500.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_bench import percentile  # noqa: E402  (también fija DATABASE_URL a una base temporal)
+from sqlalchemy import func, select  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, Categoria, Producto, User, Order, OrderLine  # noqa: E402
+
+KEY_RE = re.compile(r'name="idempotency_key" value="([0-9a-f]+)"')
+TOTAL_RE = re.compile(r'name="expected_total" value="([0-9.]+)"')
+ORDER_RE = re.compile(r"/pedidos/(\d+)$")
+
+
+def setup(app, threads, stock):
+    with app.app_context():
+        cat = Categoria(nombre="Lanzamiento", slug="lanzamiento")
+        db.session.add(cat)
+        db.session.flush()
+        product = Producto(nombre="Edición limitada", precio=150000, categoria_id=cat.id, activo=True, stock=stock)
+        # El hash no importa: los hilos entran poniendo el id en la sesión
+        users = [
+            User(nombre=f"Comprador {i}", email=f"c{i}@stress.test", password_hash="-")
+            for i in range(threads)
+        ]
+        db.session.add(product)
+        db.session.add_all(users)
+        db.session.commit()
+        return product.id, [u.id for u in users]
+
+
+def buyer(app, user_id, product_id, attempts, rnd, results, lock):
+    client = app.test_client()
+    twin = app.test_client()  # segunda pestaña para el doble click
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+    for _ in range(attempts):
+        client.post(f"/carrito/add/{product_id}", data={"qty": rnd.choice((1, 1, 1, 2))})
+        page = client.get("/checkout").get_data(as_text=True)
+        key, total = KEY_RE.search(page), TOTAL_RE.search(page)
+        if not key:
+            continue
+        data = {"idempotency_key": key.group(1), "expected_total": total.group(1)}
+        clients = [client]
+        if rnd.random() < 0.3:  # doble click: mismo submit desde la misma sesión
+            twin.set_cookie("session", client.get_cookie("session").value)
+            clients.append(twin)
+        responses = []
+
+        def submit(c):
+            t0 = time.perf_counter()
+            response = c.post("/pedidos/", data=data)
+            responses.append((time.perf_counter() - t0, response.status_code, response.location or ""))
+
+        submitters = [threading.Thread(target=submit, args=(c,)) for c in clients]
+        for t in submitters:
+            t.start()
+        for t in submitters:
+            t.join()
+        with lock:
+            for elapsed, status, location in responses:
+                results["latencies"].append(elapsed)
+                match = ORDER_RE.search(location)
+                if match:
+                    results["orders"].setdefault(key.group(1), set()).add(int(match.group(1)))
+                elif status >= 500:
+                    results["errors"] += 1
+                else:
+                    results["rejected"] += 1
+        # Si no se pudo comprar, vaciar el carrito para el próximo intento
+        client.post("/carrito/clear")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=4)
+    parser.add_argument("--max-p95", type=float, default=1000.0, help="ms")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["IMAGE_DERIVATIVES"] = False
+    product_id, user_ids = setup(app, args.threads, args.stock)
+
+    results = {"latencies": [], "orders": {}, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=buyer,
+            args=(app, uid, product_id, args.attempts, random.Random(args.seed * 1000 + i), results, lock),
+        )
+        for i, uid in enumerate(user_ids)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    with app.app_context():
+        final_stock = db.session.execute(select(Producto.stock).where(Producto.id == product_id)).scalar()
+        sold = db.session.execute(
+            select(func.coalesce(func.sum(OrderLine.qty), 0)).where(OrderLine.producto_id == product_id)
+        ).scalar()
+        orders = db.session.execute(select(func.count(Order.id))).scalar()
+        empty_orders = db.session.execute(
+            select(func.count(Order.id)).where(~Order.lines.any())
+        ).scalar()
+
+    latencies = sorted(results["latencies"])
+    p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+    keys_with_many = [k for k, ids in results["orders"].items() if len(ids) > 1]
+    print(
+        f"{args.threads} hilos x {args.attempts} intentos, {len(latencies)} confirmaciones en {wall:.1f}s "
+        f"({len(latencies) / wall:.0f}/s)"
+    )
+    print(f"stock {args.stock} -> {final_stock}, vendidas {sold}, pedidos {orders}, rechazados {results['rejected']}")
+    print(f"confirmación p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms")
+
+    failures = []
+    if final_stock is None or final_stock < 0:
+        failures.append(f"stock final inválido: {final_stock}")
+    elif sold != args.stock - final_stock:
+        failures.append(f"vendidas {sold} != stock consumido {args.stock - final_stock}")
+    if sold > args.stock:
+        failures.append(f"sobreventa: {sold} > {args.stock}")
+    if orders != len({i for ids in results["orders"].values() for i in ids}):
+        failures.append(f"{orders} pedidos en la base vs {len(results['orders'])} claves confirmadas")
+    if keys_with_many:
+        failures.append(f"{len(keys_with_many)} claves con más de un pedido")
+    if empty_orders:
+        failures.append(f"{empty_orders} pedidos sin líneas")
+    if results["errors"]:
+        failures.append(f"{results['errors']} respuestas 5xx")
+    if p95 > args.max_p95:
+        failures.append(f"p95 {p95:.1f}ms > {args.max_p95}ms")
+    for failure in failures:
+        print("FALLA", failure)
+    if not failures:
+        print("OK: sin sobreventa ni pedidos duplicados")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
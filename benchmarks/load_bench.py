@@ -0,0 +1,260 @@
+"""Benchmark de carga: reproduce una mezcla de tráfico contra create_app().
+
+Uso:
+    python benchmarks/load_bench.py                          # 1000 productos, mezcla de traffic.jsonl
+    python benchmarks/load_bench.py --products 100000 --clients 8 --requests 5000
+    python benchmarks/load_bench.py --out run.json
+    python benchmarks/load_bench.py --baseline run.json --max-regression 0.25 --max-p95 200
+
+Genera un catálogo sintético en una base SQLite temporal (la real no se toca),
+crea un comprador y un admin, y lanza N clientes concurrentes (un test client
+de Flask por hilo) que eligen requests de la mezcla según su peso. Reporta
+por endpoint p50/p95/p99, throughput y consultas SQL por request.
+
+La mezcla es un JSONL: una línea por tipo de request con name, method, path,
+weight y opcionalmente data, headers y "as": "admin". En path/data se pueden
+usar {pid} (producto activo al azar), {cart_pid} (último agregado por ese
+cliente) y {q} (término de búsqueda al azar).
+
+Sale con código 1 si algún umbral falla: --max-p95 (ms, absoluto),
+--max-regression (p95 relativo a --baseline) o si un endpoint hace más
+consultas SQL que en la base de comparación.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TMP, "bench.db")
+
+from sqlalchemy import event, insert, select  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, Categoria, Producto, User  # noqa: E402
+from catalog import HOME_SLUGS  # noqa: E402
+from catalog_cache import bump_catalog_version  # noqa: E402
+import search_index  # noqa: E402
+
+DEFAULT_MIX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traffic.jsonl")
+PALABRAS = [
+    "aros", "collar", "anillo", "cinturón", "corazón", "luna", "estrella", "cruz",
+    "gótico", "encaje", "perla", "plata", "dorado", "negro", "satén", "tachas",
+    "cadena", "murciélago", "rosa", "vintage", "artesanal", "terciopelo",
+]
+BUYER = ("comprador@bench.test", "bench-comprador")
+ADMIN = ("admin@bench.test", "bench-admin")
+
+_sql = threading.local()
+
+
+# ----------------- Datos -----------------
+def seed(n, rnd):
+    cats = [Categoria(nombre=slug.replace("-", " ").title(), slug=slug) for slug in HOME_SLUGS]
+    db.session.add_all(cats)
+    db.session.flush()
+    rows = [
+        {
+            "nombre": " ".join(rnd.sample(PALABRAS, 3)).capitalize() + f" {i}",
+            "descripcion": " ".join(rnd.choices(PALABRAS, k=12)),
+            "imagen": "",
+            "precio": rnd.randint(5, 50) * 1000,
+            "categoria_id": cats[i % len(cats)].id,
+            "activo": rnd.random() > 0.1,
+        }
+        for i in range(n)
+    ]
+    for start in range(0, n, 5000):
+        db.session.execute(insert(Producto), rows[start:start + 5000])
+    for nombre, (email, password) in (("Comprador", BUYER), ("Admin", ADMIN)):
+        user = User(nombre=nombre, email=email)
+        user.set_password(password)
+        db.session.add(user)
+    db.session.commit()
+    search_index.rebuild()
+    bump_catalog_version()
+    return db.session.execute(select(Producto.id).where(Producto.activo.is_(True))).scalars().all()
+
+
+def load_mix(path):
+    mix = []
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                entry = json.loads(line)
+                entry.setdefault("method", "GET")
+                entry.setdefault("weight", 1)
+                mix.append(entry)
+    return mix
+
+
+# ----------------- Carga -----------------
+def _count_sql(conn, cursor, statement, parameters, context, executemany):
+    _sql.count = getattr(_sql, "count", 0) + 1
+
+
+def _login(app, email, password):
+    client = app.test_client()
+    resp = client.post("/auth/login", data={"email": email, "password": password})
+    if resp.status_code != 302:
+        raise SystemExit(f"No se pudo iniciar sesión como {email} ({resp.status_code})")
+    return client
+
+
+def _fill(value, ctx):
+    if isinstance(value, str):
+        return value.format(**ctx)
+    if isinstance(value, dict):
+        return {k: _fill(v, ctx) for k, v in value.items()}
+    return value
+
+
+def worker(app, mix, product_ids, budget, results, lock, seed_value):
+    rnd = random.Random(seed_value)
+    clients = {"user": _login(app, *BUYER), "admin": _login(app, *ADMIN)}
+    weights = [entry["weight"] for entry in mix]
+    cart_pid = rnd.choice(product_ids)
+    local = defaultdict(list)
+    while True:
+        with lock:
+            if budget[0] <= 0:
+                break
+            budget[0] -= 1
+        entry = rnd.choices(mix, weights)[0]
+        ctx = {"pid": rnd.choice(product_ids), "cart_pid": cart_pid, "q": rnd.choice(PALABRAS)}
+        client = clients[entry.get("as", "user")]
+        _sql.count = 0
+        t0 = time.perf_counter()
+        resp = client.open(
+            _fill(entry["path"], ctx),
+            method=entry["method"],
+            data=_fill(entry.get("data"), ctx),
+            headers=entry.get("headers"),
+        )
+        elapsed = (time.perf_counter() - t0) * 1000
+        local[entry["name"]].append((elapsed, _sql.count, resp.status_code))
+        if "{pid}" in entry["path"] and entry["method"] == "POST":
+            cart_pid = ctx["pid"]
+    with lock:
+        for name, samples in local.items():
+            results[name].extend(samples)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+def summarize(results, wall):
+    endpoints = {}
+    for name, samples in sorted(results.items()):
+        times = [s[0] for s in samples]
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": sum(1 for s in samples if s[2] >= 400),
+            "p50_ms": round(percentile(times, 50), 2),
+            "p95_ms": round(percentile(times, 95), 2),
+            "p99_ms": round(percentile(times, 99), 2),
+            "sql_per_request": round(sum(s[1] for s in samples) / len(samples), 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"requests": total, "seconds": round(wall, 2), "rps": round(total / wall, 1), "endpoints": endpoints}
+
+
+def check_thresholds(report, baseline, max_p95, max_regression):
+    failures = []
+    for name, stats in report["endpoints"].items():
+        if stats["errors"]:
+            failures.append(f"{name}: {stats['errors']} respuestas con error")
+        if max_p95 is not None and stats["p95_ms"] > max_p95:
+            failures.append(f"{name}: p95 {stats['p95_ms']}ms > {max_p95}ms")
+        before = (baseline or {}).get("endpoints", {}).get(name)
+        if not before:
+            continue
+        if max_regression is not None and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            failures.append(
+                f"{name}: p95 {stats['p95_ms']}ms vs {before['p95_ms']}ms (+{max_regression:.0%} máx.)"
+            )
+        if stats["sql_per_request"] > before["sql_per_request"] + 0.5:
+            failures.append(
+                f"{name}: {stats['sql_per_request']} consultas/request vs {before['sql_per_request']}"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="guardar el resultado como JSON")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, help="p. ej. 0.25 = p95 hasta 25%% peor")
+    parser.add_argument("--max-p95", type=float, help="p95 máximo por endpoint, en ms")
+    args = parser.parse_args()
+
+    mix = load_mix(args.mix)
+    app = create_app()
+    app.config["IMAGE_DERIVATIVES"] = False
+    app.config["ADMIN_EMAILS"] = set(app.config["ADMIN_EMAILS"]) | {ADMIN[0]}
+    with app.app_context():
+        t0 = time.perf_counter()
+        product_ids = seed(args.products, random.Random(args.seed))
+        print(f"{args.products} productos generados en {time.perf_counter() - t0:.1f}s")
+        event.listen(db.engine, "before_cursor_execute", _count_sql)
+
+    lock = threading.Lock()
+    if args.warmup:
+        worker(app, mix, product_ids, [args.warmup], defaultdict(list), lock, -1)
+
+    results, budget = defaultdict(list), [args.requests]
+    threads = [
+        threading.Thread(
+            target=worker, args=(app, mix, product_ids, budget, results, lock, args.seed * 1000 + i)
+        )
+        for i in range(args.clients)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report = summarize(results, time.perf_counter() - t0)
+    report["config"] = {
+        "products": args.products,
+        "clients": args.clients,
+        "mix": os.path.basename(args.mix),
+    }
+
+    print(f"{report['requests']} requests, {args.clients} clientes, {report['rps']} req/s")
+    print(f"{'endpoint':<14}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'sql/req':>9}{'err':>6}")
+    for name, s in report["endpoints"].items():
+        print(
+            f"{name:<14}{s['requests']:>7}{s['p50_ms']:>8.1f}ms{s['p95_ms']:>8.1f}ms"
+            f"{s['p99_ms']:>8.1f}ms{s['sql_per_request']:>9.2f}{s['errors']:>6}"
+        )
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    failures = check_thresholds(report, baseline, args.max_p95, args.max_regression)
+    for failure in failures:
+        print("FALLA", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
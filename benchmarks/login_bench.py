@@ -0,0 +1,118 @@
+"""Benchmark de login: throughput de /auth/login y latencia de / en paralelo.
+
+Uso:
+    python benchmarks/login_bench.py                 # 16 clientes de login, 10s por escenario
+    python benchmarks/login_bench.py 32 20
+
+Levanta la app real (servidor threaded de werkzeug) sobre una base SQLite
+temporal y compara hashing inline contra el pool acotado de passwords.py.
+En cada escenario N clientes hacen login en loop mientras otro pide / y
+mide su latencia.
+"""
+import http.client
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+TMP = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TMP, "bench.db")
+
+from werkzeug.serving import make_server  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db, User  # noqa: E402
+from passwords import PasswordHasher  # noqa: E402
+
+EMAIL = "bench@faigothy.com"
+PASSWORD = "bench-password"
+SCENARIOS = [
+    ("sin carga de login", None),
+    ("hashing inline", {"workers": 0}),
+    ("pool 2 / 8 pendientes", {"workers": 2, "max_pending": 8}),
+]
+
+
+def percentile(samples, p):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def login_client(port, stop, counts, lock):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = urlencode({"email": EMAIL, "password": PASSWORD})
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    while not stop.is_set():
+        conn.request("POST", "/auth/login", body, headers)
+        resp = conn.getresponse()
+        resp.read()
+        with lock:
+            counts[resp.status] = counts.get(resp.status, 0) + 1
+
+
+def probe_home(port, stop, samples):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        conn.request("GET", "/")
+        conn.getresponse().read()
+        samples.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.01)
+
+
+def run(app, port, hasher_opts, clients, seconds):
+    if hasher_opts is not None:
+        app.extensions["password_hasher"] = PasswordHasher(
+            app.config["PASSWORD_HASH_METHOD"], **hasher_opts
+        )
+    stop = threading.Event()
+    counts, lock, samples = {}, threading.Lock(), []
+    threads = [threading.Thread(target=probe_home, args=(port, stop, samples))]
+    if hasher_opts is not None:
+        threads += [
+            threading.Thread(target=login_client, args=(port, stop, counts, lock))
+            for _ in range(clients)
+        ]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    ok = counts.get(302, 0)
+    return ok / seconds, counts.get(429, 0), samples
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    app = create_app()
+    with app.app_context():
+        user = User(nombre="Bench", email=EMAIL)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    print(f"{clients} clientes de login, {seconds:.0f}s por escenario, método {app.config['PASSWORD_HASH_METHOD']}")
+    print(f"{'escenario':<24}{'logins/s':>10}{'429':>8}{'/ p50':>10}{'/ p95':>10}{'/ p99':>10}")
+    for name, opts in SCENARIOS:
+        rate, rejected, samples = run(app, port, opts, clients, seconds)
+        print(
+            f"{name:<24}{rate:>10.1f}{rejected:>8}"
+            f"{percentile(samples, 50):>8.1f}ms{percentile(samples, 95):>8.1f}ms{percentile(samples, 99):>8.1f}ms"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
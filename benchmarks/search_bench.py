@@ -0,0 +1,89 @@
+"""Benchmark de búsqueda: FTS5 (search_index.search) vs. el ILIKE anterior.
+
+Uso:
+    python benchmarks/search_bench.py            # 10k y 100k productos
+    python benchmarks/search_bench.py 5000 50000
+
+Cada escala se genera en una base SQLite temporal; la base real no se toca.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask  # noqa: E402
+from models import db, Categoria, Producto  # noqa: E402
+import search_index  # noqa: E402
+
+PALABRAS = [
+    "aros", "collar", "anillo", "cinturón", "corazón", "luna", "estrella", "cruz",
+    "gótico", "encaje", "perla", "plata", "dorado", "negro", "satén", "tachas",
+    "cadena", "murciélago", "rosa", "vintage", "artesanal", "terciopelo",
+]
+QUERIES = ["corazon", "luna negra", "aro", "gotico cruz", "terciopelo", "xyz"]
+REPEAT = 20
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n):
+    rnd = random.Random(n)
+    cats = [Categoria(nombre=f"Cat {i}", slug=f"cat-{i}") for i in range(6)]
+    db.session.add_all(cats)
+    db.session.flush()
+    rows = []
+    for i in range(n):
+        rows.append({
+            "nombre": " ".join(rnd.sample(PALABRAS, 3)).capitalize(),
+            "descripcion": " ".join(rnd.choices(PALABRAS, k=12)),
+            "imagen": "",
+            "precio": rnd.randint(5, 50) * 1000,
+            "categoria_id": cats[i % len(cats)].id,
+            "activo": rnd.random() > 0.1,
+        })
+    db.session.execute(db.insert(Producto), rows)
+    db.session.commit()
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            db.create_all()
+            seed(n)
+            t0 = time.perf_counter()
+            search_index.rebuild()
+            print(f"\n== {n} productos (índice FTS construido en {time.perf_counter() - t0:.2f}s)")
+            print(f"{'consulta':<14}{'ilike p50':>12}{'fts p50':>12}{'ilike max':>12}{'fts max':>12}{'filas ilike':>13}")
+            for q in QUERIES:
+                rows = len(search_index.ilike_search(q))
+                ilike_p50, ilike_max = timed(lambda: search_index.ilike_search(q))
+                fts_p50, fts_max = timed(lambda: search_index.search(q, limit=24))
+                print(f"{q:<14}{ilike_p50:>10.2f}ms{fts_p50:>10.2f}ms{ilike_max:>10.2f}ms{fts_max:>10.2f}ms{rows:>13}")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        run(size)
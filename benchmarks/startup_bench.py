@@ -0,0 +1,124 @@
+"""Benchmark de arranque en frío: imports, create_app() y primer request.
+
+Uso:
+    python benchmarks/startup_bench.py                 # 5 procesos por escenario
+    python benchmarks/startup_bench.py --runs 10 --out startup.json
+    python benchmarks/startup_bench.py --baseline startup.json --max-regression 0.25
+
+Cada corrida es un proceso Python nuevo (como un worker recién lanzado) que
+importa app, llama a create_app() y atiende GET / y GET /search con el test
+client. Escenarios: sin caché de bytecode ni warm-up (lo que había antes),
+solo bytecode de Jinja en disco (ya poblado por un deploy anterior), solo
+warm-up, y las dos cosas (la configuración por defecto). Reporta la mediana
+por fase; el "total" es import + create_app + los dos primeros requests.
+
+Sale con código 1 si el total de algún escenario empeora más que
+--max-regression respecto de --baseline.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_bench import TMP, seed  # noqa: E402  (también fija DATABASE_URL a una base temporal)
+from app import create_app  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PRODUCTS = 500
+SCENARIOS = {
+    "sin caché": {"JINJA_BYTECODE_CACHE": False, "TEMPLATE_WARMUP": False},
+    "bytecode": {"JINJA_BYTECODE_CACHE": True, "TEMPLATE_WARMUP": False},
+    "warm-up": {"JINJA_BYTECODE_CACHE": False, "TEMPLATE_WARMUP": True},
+    "bytecode+warm-up": {"JINJA_BYTECODE_CACHE": True, "TEMPLATE_WARMUP": True},
+}
+PHASES = ("import", "init", "warmup", "first_request", "second_request", "total")
+
+# Corre en el proceso hijo: la configuración se pisa en el módulo config
+# antes de create_app(), que la lee con from_object.
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import config
+for key, value in {overrides!r}.items():
+    setattr(config, key, value)
+import app as app_module
+app = app_module.create_app()
+client = app.test_client()
+t0 = time.perf_counter()
+assert client.get("/").status_code == 200
+t1 = time.perf_counter()
+assert client.get("/search?q=aros").status_code == 200
+t2 = time.perf_counter()
+report = dict(app.extensions["startup"])
+report["first_request"] = t1 - t0
+report["second_request"] = t2 - t1
+report["total"] = report["import"] + report["init"] + t2 - t0
+print(json.dumps(report))
+"""
+
+
+def run_child(overrides):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT, overrides=overrides)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", help="guardar el resultado como JSON")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, help="p. ej. 0.25 = total hasta 25%% peor")
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["IMAGE_DERIVATIVES"] = False
+    with app.app_context():
+        seed(PRODUCTS, random.Random(1))
+    cache_dir = os.path.join(TMP, "jinja_cache")
+
+    report = {"runs": args.runs, "scenarios": {}}
+    print(f"{PRODUCTS} productos, {args.runs} procesos por escenario (mediana, ms)")
+    print(f"{'escenario':<18}" + "".join(f"{phase:>15}" for phase in PHASES))
+    for name, overrides in SCENARIOS.items():
+        overrides = dict(overrides, JINJA_BYTECODE_CACHE_DIR=cache_dir)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if overrides["JINJA_BYTECODE_CACHE"]:
+            # El deploy anterior (u otro worker) ya dejó el bytecode en disco
+            run_child(dict(overrides, TEMPLATE_WARMUP=True))
+        runs = [run_child(overrides) for _ in range(args.runs)]
+        medians = {phase: round(statistics.median(r[phase] for r in runs) * 1000, 1) for phase in PHASES}
+        report["scenarios"][name] = medians
+        print(f"{name:<18}" + "".join(f"{medians[phase]:>15.1f}" for phase in PHASES))
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=1)
+
+    failures = []
+    if args.baseline and args.max_regression is not None:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        for name, medians in report["scenarios"].items():
+            before = baseline.get("scenarios", {}).get(name)
+            if before and medians["total"] > before["total"] * (1 + args.max_regression):
+                failures.append(
+                    f"{name}: total {medians['total']}ms vs {before['total']}ms (+{args.max_regression:.0%} máx.)"
+                )
+    for failure in failures:
+        print("FALLA", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
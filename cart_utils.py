@@ -1,51 +1,291 @@
-from flask import session
+import threading
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, g, session
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Cart, CartLine
+
+# El carrito vive en un store server-side (SQLite o memoria); la cookie de
+# sesión solo lleva "cart_id". Cada escritura mantiene qty/total/revision del
+# carrito, así que CART_QTY y el subtotal se leen sin recorrer las líneas.
+#
+# Los carritos abandonados (cada visitante sin cookie que agrega algo deja
+# uno) se borran por updated_at con `flask prune-carts` (para cron). Si la
+# cookie vuelve con un id ya borrado, el carrito simplemente arranca vacío.
+
+CartSummary = namedtuple("CartSummary", ["qty", "total", "revision"])
+EMPTY_SUMMARY = CartSummary(0, 0.0, 0)
+
+
+def new_cart_id():
+    return uuid.uuid4().hex
+
+
+# ----------------- Stores -----------------
+class MemoryCartStore:
+    """Store en memoria del proceso (tests / desarrollo)."""
+
+    def __init__(self):
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def _cart(self, cart_id):
+        cart = self._carts.get(cart_id)
+        if cart is None:
+            cart = self._carts[cart_id] = {"items": {}, "qty": 0, "total": 0.0, "revision": 0}
+        return cart
+
+    def _touch(self, cart, dqty, dtotal):
+        cart["qty"] += dqty
+        cart["total"] += dtotal
+        cart["revision"] += 1
+        cart["updated_at"] = datetime.utcnow()
+
+    def summary(self, cart_id):
+        cart = self._carts.get(cart_id)
+        if cart is None:
+            return EMPTY_SUMMARY
+        return CartSummary(cart["qty"], cart["total"], cart["revision"])
+
+    def items(self, cart_id):
+        cart = self._carts.get(cart_id)
+        return {pid: dict(item) for pid, item in cart["items"].items()} if cart else {}
+
+    def add(self, cart_id, product_id, name, price, qty):
+        with self._lock:
+            cart = self._cart(cart_id)
+            item = cart["items"].get(product_id)
+            if item:
+                item["qty"] += qty
+            else:
+                item = cart["items"][product_id] = {"name": name, "price": price, "qty": qty}
+            self._touch(cart, qty, item["price"] * qty)
+
+    def set_quantity(self, cart_id, product_id, qty):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            item = cart and cart["items"].get(product_id)
+            if not item:
+                return
+            if qty <= 0:
+                del cart["items"][product_id]
+                qty = 0
+            delta = qty - item["qty"]
+            item["qty"] = qty
+            self._touch(cart, delta, item["price"] * delta)
+
+    def clear(self, cart_id):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart:
+                cart["items"].clear()
+                cart["qty"], cart["total"] = 0, 0.0
+                cart["revision"] += 1
+                cart["updated_at"] = datetime.utcnow()
+
+    def prune(self, older_than):
+        with self._lock:
+            old = [cid for cid, cart in self._carts.items() if cart.get("updated_at", older_than) < older_than]
+            for cart_id in old:
+                del self._carts[cart_id]
+            return len(old)
+
+
+class SQLiteCartStore:
+    """Store persistente en las tablas carts / cart_lines."""
+
+    def __init__(self):
+        self._ready_engines = set()
+
+    def _ensure_tables(self):
+        key = str(db.engine.url)
+        if key not in self._ready_engines:
+            Cart.__table__.create(db.engine, checkfirst=True)
+            CartLine.__table__.create(db.engine, checkfirst=True)
+            self._ready_engines.add(key)
+
+    def _touch(self, cart_id, dqty, dtotal):
+        # Upsert: dos primeros "agregar" simultáneos del mismo carrito no
+        # chocan en el INSERT
+        now = datetime.utcnow()
+        stmt = sqlite_insert(Cart).values(id=cart_id, qty=dqty, total=dtotal, revision=1, updated_at=now)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Cart.id],
+                set_={
+                    "qty": Cart.qty + dqty,
+                    "total": Cart.total + dtotal,
+                    "revision": Cart.revision + 1,
+                    "updated_at": now,
+                },
+            )
+        )
+
+    def summary(self, cart_id):
+        self._ensure_tables()
+        row = db.session.execute(
+            select(Cart.qty, Cart.total, Cart.revision).where(Cart.id == cart_id)
+        ).first()
+        if row is None:
+            return EMPTY_SUMMARY
+        return CartSummary(row.qty, float(row.total), row.revision)
+
+    def items(self, cart_id):
+        self._ensure_tables()
+        rows = db.session.execute(
+            select(CartLine.producto_id, CartLine.nombre, CartLine.precio, CartLine.qty)
+            .where(CartLine.cart_id == cart_id)
+            .order_by(CartLine.id)
+        )
+        return {
+            str(r.producto_id): {"name": r.nombre, "price": float(r.precio), "qty": r.qty}
+            for r in rows
+        }
+
+    def add(self, cart_id, product_id, name, price, qty):
+        self._ensure_tables()
+        # Una línea existente conserva su precio original (igual que antes)
+        existing = db.session.execute(
+            select(CartLine.precio).where(
+                (CartLine.cart_id == cart_id) & (CartLine.producto_id == int(product_id))
+            )
+        ).scalar()
+        if existing is not None:
+            price = float(existing)
+        self._touch(cart_id, qty, price * qty)
+        stmt = sqlite_insert(CartLine).values(
+            cart_id=cart_id, producto_id=int(product_id), nombre=name, precio=price, qty=qty
+        )
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CartLine.cart_id, CartLine.producto_id],
+                set_={"qty": CartLine.qty + qty},
+            )
+        )
+        db.session.commit()
+
+    def set_quantity(self, cart_id, product_id, qty):
+        self._ensure_tables()
+        where = (CartLine.cart_id == cart_id) & (CartLine.producto_id == int(product_id))
+        line = db.session.execute(select(CartLine.qty, CartLine.precio).where(where)).first()
+        if line is None:
+            return
+        if qty <= 0:
+            db.session.execute(delete(CartLine).where(where))
+            qty = 0
+        else:
+            db.session.execute(update(CartLine).where(where).values(qty=qty))
+        delta = qty - line.qty
+        self._touch(cart_id, delta, float(line.precio) * delta)
+        db.session.commit()
+
+    def clear(self, cart_id):
+        self._ensure_tables()
+        db.session.execute(delete(CartLine).where(CartLine.cart_id == cart_id))
+        db.session.execute(
+            update(Cart)
+            .where(Cart.id == cart_id)
+            .values(qty=0, total=0, revision=Cart.revision + 1, updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def prune(self, older_than, batch_size=1000):
+        """Borra carritos (y líneas) sin cambios desde ``older_than``; por lotes."""
+        self._ensure_tables()
+        removed = 0
+        while True:
+            ids = db.session.execute(
+                select(Cart.id).where(Cart.updated_at < older_than).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return removed
+            db.session.execute(delete(CartLine).where(CartLine.cart_id.in_(ids)))
+            db.session.execute(delete(Cart).where(Cart.id.in_(ids), Cart.updated_at < older_than))
+            db.session.commit()
+            removed += len(ids)
+
+
+CART_BACKENDS = {
+    "sqlite": SQLiteCartStore,
+    "memory": MemoryCartStore,
+}
+
+
+def init_cart_store(app):
+    app.config.setdefault("CART_BACKEND", "sqlite")
+    app.config.setdefault("CART_MAX_AGE_DAYS", 30)  # flask prune-carts
+    backend = app.config["CART_BACKEND"]
+    if backend not in CART_BACKENDS:
+        raise ValueError(f"CART_BACKEND desconocido: {backend!r}")
+    app.extensions["cart_store"] = CART_BACKENDS[backend]()
+
+
+# ----------------- API usada por las rutas -----------------
+def _store():
+    return current_app.extensions["cart_store"]
+
+
+def _cart_id(create=False):
+    cart_id = session.get("cart_id")
+    # Carrito viejo serializado en la cookie: se migra al store una sola vez
+    legacy = session.pop("cart") if "cart" in session else None
+    if cart_id is None and (create or legacy):
+        cart_id = session["cart_id"] = new_cart_id()
+    if legacy:
+        for pid, item in legacy.items():
+            _store().add(cart_id, str(pid), item["name"], float(item["price"]), int(item["qty"]))
+    return cart_id
+
+
+def current_cart_id():
+    return _cart_id()
+
+
+def _changed():
+    g.pop("_cart_summary", None)
+
+
+def cart_summary():
+    if "_cart_summary" not in g:
+        cart_id = _cart_id()
+        g._cart_summary = _store().summary(cart_id) if cart_id else EMPTY_SUMMARY
+    return g._cart_summary
 
-def _get_cart():
-    cart = session.get("cart")
-    if cart is None:
-        cart = {}
-        session["cart"] = cart
-    return cart
 
 def cart_items():
-    return _get_cart()
+    cart_id = _cart_id()
+    return _store().items(cart_id) if cart_id else {}
 
 def add_to_cart(product_id, name, price, qty=1):
-    cart = _get_cart()
-    product_id = str(product_id)
-    if product_id in cart:
-        cart[product_id]["qty"] += int(qty)
-    else:
-        cart[product_id] = {"name": name, "price": float(price), "qty": int(qty)}
-    session["cart"] = cart
+    _store().add(_cart_id(create=True), str(product_id), name, float(price), int(qty))
+    _changed()
 
 def remove_from_cart(product_id):
-    cart = _get_cart()
-    product_id = str(product_id)
-    if product_id in cart:
-        del cart[product_id]
-        session["cart"] = cart
+    update_quantity(product_id, 0)
 
 def update_quantity(product_id, qty):
-    cart = _get_cart()
-    product_id = str(product_id)
-    if product_id in cart:
-        qty = int(qty)
-        if qty <= 0:
-            del cart[product_id]
-        else:
-            cart[product_id]["qty"] = qty
-        session["cart"] = cart
+    cart_id = _cart_id()
+    if cart_id:
+        _store().set_quantity(cart_id, str(product_id), int(qty))
+        _changed()
 
 def cart_total():
-    cart = _get_cart()
-    total = 0.0
-    for _, item in cart.items():
-        total += float(item["price"]) * int(item["qty"])
-    return total
+    return cart_summary().total
 
 def cart_qty():
-    return sum(int(v.get("qty", 0)) for v in _get_cart().values())
+    return cart_summary().qty
 
 def clear_cart():
-    session["cart"] = {}
+    cart_id = _cart_id()
+    if cart_id:
+        _store().clear(cart_id)
+        _changed()
+
+
+def prune_carts(max_age_days=None):
+    """Borra los carritos sin actividad en ``max_age_days`` (CART_MAX_AGE_DAYS)."""
+    if max_age_days is None:
+        max_age_days = current_app.config["CART_MAX_AGE_DAYS"]
+    return _store().prune(datetime.utcnow() - timedelta(days=max_age_days))
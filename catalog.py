@@ -0,0 +1,256 @@
+from collections import namedtuple
+from sqlalchemy import and_, case, func, or_, select, tuple_
+from models import db, Producto, Categoria
+from catalog_cache import cached
+import search_index
+
+# Categorías que se muestran como carrusel en el home (en orden).
+HOME_SLUGS = [
+    "accesorios-pelo",
+    "aros",
+    "anillos",
+    "cinturones",
+    "collares",
+    "prendas",
+]
+HOME_LATEST_LIMIT = 24
+HOME_SHELF_LIMIT = 12
+
+# Copia inmutable de un producto, segura para compartir entre requests (a
+# diferencia de las instancias ORM, atadas a una sesión).
+ProductSnapshot = namedtuple(
+    "ProductSnapshot",
+    ["id", "nombre", "descripcion", "imagen", "precio", "categoria_id", "activo"],
+)
+
+
+def snapshot(p: Producto) -> ProductSnapshot:
+    return ProductSnapshot(
+        p.id, p.nombre, p.descripcion, p.imagen, p.precio, p.categoria_id, p.activo
+    )
+
+
+def product_snapshot(product_id):
+    """Snapshot cacheado de un producto, o None si no existe."""
+
+    def build():
+        p = db.session.get(Producto, product_id)
+        return snapshot(p) if p else None
+
+    return cached(("producto", int(product_id)), build)
+
+
+def home_shelves_query():
+    ranked = (
+        db.session.query(
+            Producto.id.label("pid"),
+            Categoria.slug.label("slug"),
+            func.row_number()
+            .over(partition_by=Producto.categoria_id, order_by=Producto.id.desc())
+            .label("cat_rank"),
+            func.row_number().over(order_by=Producto.id.desc()).label("latest_rank"),
+        )
+        .outerjoin(Categoria, Categoria.id == Producto.categoria_id)
+        .filter(Producto.activo == True)
+        .subquery()
+    )
+    return (
+        db.session.query(Producto, ranked.c.slug, ranked.c.cat_rank, ranked.c.latest_rank)
+        .join(ranked, ranked.c.pid == Producto.id)
+        .filter(
+            or_(
+                ranked.c.latest_rank <= HOME_LATEST_LIMIT,
+                and_(ranked.c.slug.in_(HOME_SLUGS), ranked.c.cat_rank <= HOME_SHELF_LIMIT),
+            )
+        )
+        .order_by(Producto.id.desc())
+    )
+
+
+def home_shelves():
+    """Novedades + top N por categoría del home en una sola consulta.
+
+    Devuelve ``(latest_products, productos_by_cat)``.
+    """
+    rows = home_shelves_query().all()
+
+    latest_products = []
+    productos_by_cat = {slug: [] for slug in HOME_SLUGS}
+    for p, slug, cat_rank, latest_rank in rows:
+        if latest_rank <= HOME_LATEST_LIMIT:
+            latest_products.append(p)
+        if slug in productos_by_cat and cat_rank <= HOME_SHELF_LIMIT:
+            productos_by_cat[slug].append(p)
+    return latest_products, productos_by_cat
+
+
+def search_products(query, limit, cursor=None):
+    """Página de búsqueda como snapshots, cacheada por versión del catálogo."""
+
+    def build():
+        productos, next_cursor = search_index.search(query, limit=limit, cursor=cursor)
+        return [snapshot(p) for p in productos], next_cursor
+
+    return cached(("search", search_index.normalize(query), cursor, limit), build)
+
+
+def admin_products_query(categoria=None, activo="", q="", after=None):
+    """Listado del admin: solo columnas de la tabla, keyset por id desc."""
+    query = db.session.query(
+        Producto.id,
+        Producto.nombre,
+        Producto.precio,
+        Producto.activo,
+        Categoria.nombre.label("categoria_nombre"),
+    ).outerjoin(Categoria, Categoria.id == Producto.categoria_id)
+    if categoria:
+        query = query.filter(Producto.categoria_id == categoria)
+    if activo in ("1", "0"):
+        query = query.filter(Producto.activo == (activo == "1"))
+    if q:
+        prefix = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Producto.nombre.like(prefix + "%", escape="\\"))
+    if after:
+        query = query.filter(Producto.id < after)
+    return query.order_by(Producto.id.desc())
+
+
+CategorySnapshot = namedtuple("CategorySnapshot", ["id", "nombre", "slug"])
+
+
+def category_by_slug(slug):
+    """Snapshot cacheado de la categoría, o None si el slug no existe."""
+
+    def build():
+        c = db.session.query(Categoria).filter(Categoria.slug == slug).first()
+        return CategorySnapshot(c.id, c.nombre, c.slug) if c else None
+
+    return cached(("categoria", slug), build)
+
+
+
+# ----------------- Páginas de categoría -----------------
+# /categoria/<slug>: orden, rango de precio y paginación por cursor
+# (keyset), todo resuelto por índices compuestos (ver database.py, 0006):
+#   nuevos       -> (activo, categoria_id, id)
+#   precio ±     -> (activo, categoria_id, precio, id), también para el rango
+# Los conteos de los filtros salen de una sola agregación por versión del
+# catálogo (category_facets); un click en un filtro no hace GROUP BY.
+CATEGORY_SORTS = {
+    "nuevos": "Más nuevos",
+    "precio_asc": "Menor precio",
+    "precio_desc": "Mayor precio",
+}
+# Límites de los rangos de precio (₲): [0, 25000), [25000, 50000), ...
+PRICE_BUCKETS = (25000, 50000, 100000)
+
+PriceBucket = namedtuple("PriceBucket", ["key", "low", "high"])
+
+
+def price_buckets():
+    edges = (0, *PRICE_BUCKETS, None)
+    return [
+        PriceBucket(f"{low}-{'' if high is None else high}", low, high)
+        for low, high in zip(edges, edges[1:])
+    ]
+
+
+def price_bucket(key):
+    """El rango con esa clave (``?precio=25000-50000``), o None."""
+    for bucket in price_buckets():
+        if bucket.key == key:
+            return bucket
+    return None
+
+
+def _bucket_expr():
+    return case(
+        *((Producto.precio < high, i) for i, high in enumerate(PRICE_BUCKETS)),
+        else_=len(PRICE_BUCKETS),
+    )
+
+
+def category_facets():
+    """Categorías y conteos de productos activos por (categoría, rango).
+
+    Devuelve ``(categorias, counts)``: snapshots ordenados por nombre y
+    ``{(categoria_id, índice del rango): n}``. Una agregación (cubierta por
+    el índice de precio) por versión del catálogo.
+    """
+
+    def build():
+        bucket = _bucket_expr().label("bucket")
+        rows = db.session.execute(
+            select(Producto.categoria_id, bucket, func.count())
+            .where(Producto.activo == True)
+            .group_by(Producto.categoria_id, bucket)
+        ).all()
+        categorias = [
+            CategorySnapshot(c.id, c.nombre, c.slug)
+            for c in db.session.query(Categoria).order_by(Categoria.nombre)
+            if c.slug
+        ]
+        return categorias, {(cid, b): n for cid, b, n in rows}
+
+    return cached(("categoria_facets", PRICE_BUCKETS), build)
+
+
+def category_filters(categoria_id, bucket=None):
+    """Conteos para los filtros de la página, sin tocar la tabla.
+
+    Los rangos de precio cuentan dentro de la categoría; las categorías,
+    dentro del rango elegido (o en total).
+    """
+    categorias, counts = category_facets()
+    buckets = price_buckets()
+    selected = [buckets.index(bucket)] if bucket else range(len(buckets))
+
+    def count(cid):
+        return sum(counts.get((cid, i), 0) for i in selected)
+
+    return {
+        "precios": [(b, counts.get((categoria_id, i), 0)) for i, b in enumerate(buckets)],
+        "categorias": [(c, count(c.id)) for c in categorias],
+        "total": count(categoria_id),
+    }
+
+
+def category_page_query(categoria_id, sort="nuevos", bucket=None, after=None):
+    """Productos activos de la categoría; ``after`` = (precio, id) del último."""
+    query = db.session.query(Producto).filter(
+        Producto.activo == True, Producto.categoria_id == categoria_id
+    )
+    if bucket is not None:
+        query = query.filter(Producto.precio >= bucket.low)
+        if bucket.high is not None:
+            query = query.filter(Producto.precio < bucket.high)
+    if sort == "precio_asc":
+        if after:
+            query = query.filter(tuple_(Producto.precio, Producto.id) > tuple_(*after))
+        return query.order_by(Producto.precio, Producto.id)
+    if sort == "precio_desc":
+        if after:
+            query = query.filter(tuple_(Producto.precio, Producto.id) < tuple_(*after))
+        return query.order_by(Producto.precio.desc(), Producto.id.desc())
+    if after:
+        query = query.filter(Producto.id < after[1])
+    return query.order_by(Producto.id.desc())
+
+
+def category_page(categoria_id, limit, sort="nuevos", bucket=None, cursor=None):
+    """Página de la categoría como snapshots, cacheada por versión del catálogo.
+
+    Devuelve ``(productos, next_cursor)``.
+    """
+
+    def build():
+        after = search_index.decode_cursor(cursor) if cursor else None
+        rows = category_page_query(categoria_id, sort, bucket, after).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = search_index.encode_cursor(float(rows[-1].precio or 0), rows[-1].id)
+        return [snapshot(p) for p in rows], next_cursor
+
+    key = bucket.key if bucket else None
+    return cached(("categoria_pagina", categoria_id, sort, key, cursor, limit), build)
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, CatalogVersion
+
+# Caché en proceso de todo lo que se deriva del catálogo (estantes del home,
+# snapshots de productos, resultados de búsqueda...). Cada entrada queda
+# asociada a la versión del catálogo con la que se construyó.
+#
+# La versión vive en una fila compartida (tabla catalog_version): el admin la
+# incrementa en cada cambio y los demás workers la releen como mucho cada
+# ``poll_interval`` segundos, vaciando su caché cuando cambia.
+
+_MISSING = object()
+_ready_engines = set()
+
+
+def _ensure_table():
+    key = str(db.engine.url)
+    if key not in _ready_engines:
+        CatalogVersion.__table__.create(db.engine, checkfirst=True)
+        _ready_engines.add(key)
+
+
+def _read_shared_version():
+    _ensure_table()
+    version = db.session.execute(
+        select(CatalogVersion.version).where(CatalogVersion.id == 1)
+    ).scalar()
+    return version or 0
+
+
+def _bump_shared_version():
+    _ensure_table()
+    # Upsert en una sentencia: si la fila todavía no existe, dos bumps
+    # simultáneos no chocan en el INSERT de id=1
+    stmt = sqlite_insert(CatalogVersion).values(id=1, version=1)
+    version = db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CatalogVersion.id],
+            set_={"version": CatalogVersion.version + 1},
+        ).returning(CatalogVersion.version)
+    ).scalar()
+    db.session.commit()
+    return version
+
+
+class CatalogCache:
+    """LRU acotado con TTL, invalidado en bloque al cambiar la versión."""
+
+    def __init__(self, max_entries=512, ttl=300.0, poll_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries=None, ttl=None, poll_interval=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+        if poll_interval is not None:
+            self.poll_interval = poll_interval
+
+    # ---- versión ----
+    def current_version(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.poll_interval:
+            self._checked_at = now
+            shared = _read_shared_version()
+            if shared != self.version:
+                self._set_version(shared)
+        return self.version
+
+    def bump(self):
+        version = _bump_shared_version()
+        self._set_version(version)
+        self._checked_at = time.monotonic()
+        return version
+
+    def _set_version(self, version):
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+            self.invalidations += 1
+
+    # ---- entradas ----
+    def get(self, key, default=None):
+        version = self.current_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            entry_version, expires_at, value = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version=None):
+        if version is None:
+            version = self.version
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def cached(self, key, build):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        version = self.version
+        value = build()
+        # Si la versión cambió mientras se construía, la entrada queda guardada
+        # con la versión vieja y se descarta en la próxima lectura.
+        self.set(key, value, version)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+catalog_cache = CatalogCache()
+
+
+def init_catalog_cache(app):
+    app.config.setdefault("CATALOG_CACHE_MAX_ENTRIES", 512)
+    app.config.setdefault("CATALOG_CACHE_TTL", 300.0)
+    app.config.setdefault("CATALOG_VERSION_POLL", 1.0)
+    catalog_cache.configure(
+        max_entries=app.config["CATALOG_CACHE_MAX_ENTRIES"],
+        ttl=app.config["CATALOG_CACHE_TTL"],
+        poll_interval=app.config["CATALOG_VERSION_POLL"],
+    )
+
+
+def catalog_version():
+    return catalog_cache.current_version()
+
+
+def bump_catalog_version():
+    return catalog_cache.bump()
+
+
+def cached(key, build):
+    return catalog_cache.cached(key, build)
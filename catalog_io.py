@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select, update, tuple_
+from models import db, Producto, Categoria
+from catalog_cache import bump_catalog_version
+import search_index
+import catalog_stats
+import prerender
+
+# Importación / exportación masiva del catálogo (CSV o JSONL).
+#
+# La importación lee en streaming y escribe por lotes: las categorías se
+# resuelven una sola vez, cada lote busca sus productos existentes con una
+# consulta y hace un executemany de INSERT y de UPDATE (uno por conjunto de
+# columnas presentes) dentro de su propia transacción. Un producto se
+# identifica por (categoría, nombre), igual que en seed_faigothy_sqlalchemy.py.
+
+FIELDS = ["nombre", "descripcion", "precio", "categoria", "imagen", "activo"]
+FORMATS = ("csv", "jsonl")
+DEFAULT_BATCH_SIZE = 5000
+
+ImportResult = namedtuple("ImportResult", ["processed", "inserted", "updated", "errors"])
+
+
+class RowError(ValueError):
+    pass
+
+
+# ----------------- Lectura -----------------
+def read_rows(stream, fmt):
+    """Genera ``(número_de_línea, dict)`` desde un stream de texto."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_num, RowError(f"JSON inválido: {exc}")
+                continue
+            yield line_num, row if isinstance(row, dict) else RowError("se esperaba un objeto")
+    else:
+        raise ValueError(f"Formato desconocido: {fmt!r}")
+
+
+def _parse_bool(value):
+    # Celda vacía => activo, como el default del modelo
+    if isinstance(value, bool):
+        return value
+    return str(value if value is not None else "").strip().lower() not in ("0", "false", "no", "n")
+
+
+# Columnas opcionales: si el archivo no las trae (o vienen en null) el
+# UPDATE no las toca; un archivo de precios con nombre/precio/categoria no
+# borra imágenes ni reactiva productos. Los defaults son solo para altas.
+INSERT_DEFAULTS = {"descripcion": "", "precio": Decimal("0"), "imagen": "", "activo": True}
+
+
+def _clean(row, cat_ids):
+    if isinstance(row, RowError):
+        raise row
+    nombre = (row.get("nombre") or "").strip()
+    if not nombre:
+        raise RowError("falta nombre")
+    slug = (row.get("categoria") or "").strip()
+    if slug not in cat_ids:
+        raise RowError(f"categoría desconocida: {slug!r}")
+    values = {"nombre": nombre, "categoria_id": cat_ids[slug]}
+    if row.get("precio") is not None:
+        try:
+            precio = Decimal(str(row["precio"]).strip() or "0")
+        except InvalidOperation:
+            raise RowError(f"precio inválido: {row.get('precio')!r}")
+        if precio < 0:
+            raise RowError("precio negativo")
+        values["precio"] = precio
+    for field in ("descripcion", "imagen"):
+        if row.get(field) is not None:
+            values[field] = str(row[field]).strip()
+    if row.get("activo") is not None:
+        values["activo"] = _parse_bool(row["activo"])
+    return values
+
+
+# ----------------- Importación -----------------
+def _write_batch(batch):
+    keys = list(batch)
+    existing = {
+        (categoria_id, nombre): pid
+        for categoria_id, nombre, pid in db.session.execute(
+            select(Producto.categoria_id, Producto.nombre, Producto.id).where(
+                tuple_(Producto.categoria_id, Producto.nombre).in_(keys)
+            )
+        )
+    }
+    # UPDATE agrupado por columnas presentes: un executemany por grupo
+    updates, inserts = {}, []
+    for key, values in batch.items():
+        if key in existing:
+            updates.setdefault(frozenset(values), []).append({"id": existing[key], **values})
+        else:
+            inserts.append({**INSERT_DEFAULTS, **values})
+    if inserts:
+        db.session.execute(insert(Producto), inserts)
+    for group in updates.values():
+        db.session.execute(update(Producto), group)
+    db.session.commit()
+    return len(inserts), sum(len(group) for group in updates.values())
+
+
+def import_rows(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Importa ``rows`` (de read_rows) y devuelve un ImportResult.
+
+    ``progress(result)`` se llama después de cada lote. Los errores son
+    ``(número_de_línea, mensaje)``; las filas con error se saltean.
+    """
+    cat_ids = dict(db.session.execute(select(Categoria.slug, Categoria.id)).all())
+    processed = inserted = updated = 0
+    errors = []
+    batch = {}
+
+    def flush():
+        nonlocal inserted, updated, batch
+        if batch:
+            ins, upd = _write_batch(batch)
+            inserted += ins
+            updated += upd
+            batch = {}
+            if progress:
+                progress(ImportResult(processed, inserted, updated, errors))
+
+    for line_num, row in rows:
+        processed += 1
+        try:
+            values = _clean(row, cat_ids)
+        except RowError as exc:
+            errors.append((line_num, str(exc)))
+            continue
+        # Repetidos dentro del archivo: gana la última fila
+        batch[(values["categoria_id"], values["nombre"])] = values
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if inserted or updated:
+        search_index.rebuild()
+        # Las escrituras masivas no disparan los eventos del ORM
+        catalog_stats.recompute_stats()
+        db.session.commit()
+        bump_catalog_version()
+        prerender.refresh()
+    return ImportResult(processed, inserted, updated, errors)
+
+
+# ----------------- Exportación -----------------
+def export_rows(fmt, chunk_size=1000):
+    """Genera el catálogo como texto CSV/JSONL, fila por fila."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt!r}")
+    result = db.session.execute(
+        select(
+            Producto.nombre,
+            Producto.descripcion,
+            Producto.precio,
+            Categoria.slug,
+            Producto.imagen,
+            Producto.activo,
+        )
+        .outerjoin(Categoria, Categoria.id == Producto.categoria_id)
+        .order_by(Producto.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        writer.writerow(FIELDS)
+    for nombre, descripcion, precio, slug, imagen, activo in result:
+        if fmt == "csv":
+            writer.writerow([nombre, descripcion or "", precio, slug or "", imagen or "", int(bool(activo))])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        else:
+            yield json.dumps(
+                {
+                    "nombre": nombre,
+                    "descripcion": descripcion or "",
+                    "precio": str(precio),
+                    "categoria": slug or "",
+                    "imagen": imagen or "",
+                    "activo": bool(activo),
+                },
+                ensure_ascii=False,
+            ) + "\n"
+    if fmt == "csv" and buf.tell():
+        yield buf.getvalue()
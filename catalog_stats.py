@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, or_, select, update
+from flask import current_app
+from models import db, Producto, Categoria, CatalogStats
+
+# Estadísticas del catálogo para el dashboard del admin: productos por
+# categoría, activos/inactivos, precio mínimo/máximo/promedio y suma de
+# precios activos. En vez de agregar sobre productos en cada vista, cada fila de
+# catalog_stats (una por categoría) se actualiza con deltas desde los eventos
+# de SQLAlchemy de Producto, en la misma transacción que el cambio.
+#
+# - Alta/baja/edición por el ORM: deltas de conteo y suma; el mínimo/máximo
+#   solo se recalcula (para esa categoría, con el índice de activo +
+#   categoría) si el producto que sale era justo el extremo.
+# - Escrituras masivas que no pasan por el ORM (import del catálogo, seeds):
+#   recompute_stats() al terminar.
+# - Corrección de deriva: si la última pasada completa tiene más de
+#   CATALOG_STATS_RECOMPUTE_SECONDS, el dashboard recalcula todo antes de leer
+#   (también hay `flask recompute-stats` para cron).
+
+SIN_CATEGORIA = 0
+FIELDS = ("categoria_id", "activo", "precio")
+
+stats = CatalogStats.__table__
+
+
+def _precio(value):
+    return literal(Decimal(str(value or 0)), CatalogStats.precio_max.type)
+
+
+def _in_category(key):
+    if key == SIN_CATEGORIA:
+        # El form del admin guarda 0 cuando no se elige categoría
+        return or_(Producto.categoria_id.is_(None), Producto.categoria_id == SIN_CATEGORIA)
+    return Producto.categoria_id == key
+
+
+def _bounds(key, fn):
+    return (
+        select(fn(Producto.precio))
+        .where(Producto.activo.is_(True), _in_category(key))
+        .scalar_subquery()
+    )
+
+
+def _add(connection, categoria_id, activo, precio):
+    key = categoria_id or SIN_CATEGORIA
+    precio = _precio(precio)
+    values = {"productos": stats.c.productos + 1}
+    if activo:
+        values.update(
+            activos=stats.c.activos + 1,
+            precio_suma=stats.c.precio_suma + precio,
+            precio_min=case(
+                (or_(stats.c.precio_min.is_(None), stats.c.precio_min > precio), precio),
+                else_=stats.c.precio_min,
+            ),
+            precio_max=case(
+                (or_(stats.c.precio_max.is_(None), stats.c.precio_max < precio), precio),
+                else_=stats.c.precio_max,
+            ),
+        )
+    result = connection.execute(update(stats).where(stats.c.categoria_id == key).values(values))
+    if result.rowcount == 0:
+        connection.execute(
+            insert(stats).values(
+                categoria_id=key,
+                productos=1,
+                activos=1 if activo else 0,
+                precio_suma=precio if activo else 0,
+                precio_min=precio if activo else None,
+                precio_max=precio if activo else None,
+            )
+        )
+
+
+def _remove(connection, categoria_id, activo, precio):
+    key = categoria_id or SIN_CATEGORIA
+    precio = _precio(precio)
+    values = {"productos": stats.c.productos - 1}
+    if activo:
+        values.update(activos=stats.c.activos - 1, precio_suma=stats.c.precio_suma - precio)
+    connection.execute(update(stats).where(stats.c.categoria_id == key).values(values))
+    if activo:
+        # El mínimo/máximo no se puede "restar": si salió un extremo se
+        # recalcula el de esta categoría (la fila ya no está en la base)
+        connection.execute(
+            update(stats)
+            .where(
+                stats.c.categoria_id == key,
+                or_(stats.c.precio_min >= precio, stats.c.precio_max <= precio),
+            )
+            .values(precio_min=_bounds(key, func.min), precio_max=_bounds(key, func.max))
+        )
+
+
+def _values(target, old=False):
+    state = inspect(target)
+    values = []
+    for name in FIELDS:
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if old and history.deleted else getattr(target, name))
+    return values
+
+
+@event.listens_for(Producto, "after_insert")
+def _on_insert(mapper, connection, target):
+    _add(connection, *_values(target))
+
+
+@event.listens_for(Producto, "after_update")
+def _on_update(mapper, connection, target):
+    before, after = _values(target, old=True), _values(target)
+    if before != after:
+        _remove(connection, *before)
+        _add(connection, *after)
+
+
+@event.listens_for(Producto, "after_delete")
+def _on_delete(mapper, connection, target):
+    _remove(connection, *_values(target, old=True))
+
+
+# ----------------- Recalculo completo -----------------
+def recompute_stats():
+    """Rearma catalog_stats desde productos (no hace commit); devuelve cuántas filas."""
+    key = func.coalesce(Producto.categoria_id, SIN_CATEGORIA)
+    activo = Producto.activo.is_(True)
+    rows = db.session.execute(
+        select(
+            key,
+            func.count(),
+            func.sum(case((activo, 1), else_=0)),
+            func.sum(case((activo, Producto.precio), else_=0)),
+            func.min(case((activo, Producto.precio))),
+            func.max(case((activo, Producto.precio))),
+        ).group_by(key)
+    ).all()
+    now = datetime.utcnow()
+    db.session.execute(delete(stats))
+    if rows:
+        db.session.execute(
+            insert(stats),
+            [
+                {
+                    "categoria_id": categoria_id,
+                    "productos": productos,
+                    "activos": activos or 0,
+                    "precio_suma": suma or 0,
+                    "precio_min": minimo,
+                    "precio_max": maximo,
+                    "recomputed_at": now,
+                }
+                for categoria_id, productos, activos, suma, minimo, maximo in rows
+            ],
+        )
+    return len(rows)
+
+
+# ----------------- Lectura (dashboard) -----------------
+def _summary(productos, activos, suma, minimo, maximo):
+    suma = Decimal(suma or 0)
+    return {
+        "productos": productos,
+        "activos": activos,
+        "inactivos": productos - activos,
+        "precio_min": minimo,
+        "precio_max": maximo,
+        "precio_promedio": (suma / activos).quantize(Decimal("0.01")) if activos else None,
+        # No es un valor de inventario: no se pondera por stock porque el
+        # checkout lo descuenta con un UPDATE que no pasa por los eventos
+        # del ORM (y muchos productos no lo controlan, NULL)
+        "suma_precios": suma,
+    }
+
+
+def _rows():
+    return db.session.execute(
+        select(CatalogStats, Categoria.nombre)
+        .outerjoin(Categoria, Categoria.id == CatalogStats.categoria_id)
+        .order_by(Categoria.nombre)
+    ).all()
+
+
+def catalog_stats():
+    """Resumen por categoría y total; lee una fila por categoría."""
+    max_age = current_app.config["CATALOG_STATS_RECOMPUTE_SECONDS"]
+    rows = _rows()
+    last = max((row.recomputed_at for row, _ in rows if row.recomputed_at), default=None)
+    if max_age and (last is None or datetime.utcnow() - last > timedelta(seconds=max_age)):
+        recompute_stats()
+        db.session.commit()
+        rows = _rows()
+        last = max((row.recomputed_at for row, _ in rows), default=None)
+
+    categorias = [
+        dict(
+            nombre=nombre or "Sin categoría",
+            **_summary(row.productos, row.activos, row.precio_suma, row.precio_min, row.precio_max),
+        )
+        for row, nombre in rows
+        if row.productos
+    ]
+    mins = [row.precio_min for row, _ in rows if row.precio_min is not None]
+    maxs = [row.precio_max for row, _ in rows if row.precio_max is not None]
+    total = _summary(
+        sum(row.productos for row, _ in rows),
+        sum(row.activos for row, _ in rows),
+        sum((Decimal(row.precio_suma) for row, _ in rows), Decimal(0)),
+        min(mins, default=None),
+        max(maxs, default=None),
+    )
+    return {"categorias": categorias, "total": total, "recomputed_at": last}
+
+
+def init_catalog_stats(app):
+    app.config.setdefault("CATALOG_STATS_RECOMPUTE_SECONDS", 3600)
@@ -0,0 +1,196 @@
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import images
+import assets
+import catalog_io
+import database
+import catalog_stats
+import uploads
+import prerender
+from cart_utils import prune_carts
+from catalog_cache import bump_catalog_version
+from models import db
+
+# Comandos de mantenimiento: `flask --app app <comando>`
+
+
+@click.command("backfill-images")
+@click.option("--workers", type=int, default=os.cpu_count(), show_default=True, help="Procesos en paralelo.")
+@click.option("--force", is_flag=True, help="Regenerar aunque los derivados estén al día.")
+@with_appcontext
+def backfill_images_command(workers, force):
+    """Genera derivados responsive para las imágenes existentes."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    folder = current_app.config["UPLOAD_FOLDER"]
+    widths = tuple(current_app.config["IMAGE_WIDTHS"])
+    formats = tuple(current_app.config["IMAGE_FORMATS"])
+    pending = [
+        name for name in images.source_images(folder)
+        if force or images.needs_derivatives(folder, name)
+    ]
+    if not pending:
+        click.echo("Derivados al día.")
+        return
+
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                images.generate_derivatives,
+                os.path.join(folder, name),
+                images.derivative_dir(folder, name),
+                widths,
+                formats,
+            ): name
+            for name in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                future.result()
+                click.echo(f"[{done}/{len(pending)}] {name}")
+            except Exception as exc:
+                failed += 1
+                click.echo(f"[{done}/{len(pending)}] {name}: ERROR {exc}", err=True)
+
+    bump_catalog_version()
+    prerender.refresh()  # srcset nuevos en las páginas estáticas
+    click.echo(f"{len(pending) - failed} imágenes procesadas en {time.perf_counter() - started:.1f}s ({failed} errores).")
+
+
+@click.command("build-assets")
+@with_appcontext
+def build_assets_command():
+    """Genera static_dist/ (assets con hash + .gz/.br) y su manifiesto."""
+    manifest = assets.build_assets(
+        current_app.static_folder, current_app.config["ASSET_DIST_FOLDER"]
+    )
+    click.echo(f"{len(manifest)} assets en {current_app.config['ASSET_DIST_FOLDER']}")
+
+
+@click.command("prune-assets")
+@click.option("--keep", type=int, default=3, show_default=True, help="Builds cuyos archivos se conservan.")
+@with_appcontext
+def prune_assets_command(keep):
+    """Borra de static_dist/ los assets que no usa ninguno de los últimos builds."""
+    removed = assets.prune_assets(current_app.config["ASSET_DIST_FOLDER"], keep=max(keep, 1))
+    click.echo(f"{len(removed)} archivos borrados.")
+
+
+@click.command("import-catalog")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(catalog_io.FORMATS), help="Por defecto, según la extensión.")
+@click.option("--batch-size", type=int, default=catalog_io.DEFAULT_BATCH_SIZE, show_default=True)
+@with_appcontext
+def import_catalog_command(path, fmt, batch_size):
+    """Importa/actualiza productos desde un CSV o JSONL."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    started = time.perf_counter()
+
+    def progress(result):
+        click.echo(f"  {result.processed} filas · {result.inserted} nuevas · {result.updated} actualizadas · {len(result.errors)} errores")
+
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        result = catalog_io.import_rows(catalog_io.read_rows(fh, fmt), batch_size=batch_size, progress=progress)
+    for line_num, message in result.errors:
+        click.echo(f"línea {line_num}: {message}", err=True)
+    click.echo(
+        f"{result.inserted} nuevas, {result.updated} actualizadas, {len(result.errors)} errores "
+        f"en {time.perf_counter() - started:.1f}s."
+    )
+
+
+@click.command("export-catalog")
+@click.option("--format", "fmt", type=click.Choice(catalog_io.FORMATS), default="csv", show_default=True)
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-")
+@with_appcontext
+def export_catalog_command(fmt, output):
+    """Exporta el catálogo (streaming) a un archivo o stdout."""
+    for chunk in catalog_io.export_rows(fmt):
+        output.write(chunk)
+
+
+@click.command("db-upgrade")
+@with_appcontext
+def db_upgrade_command():
+    """Aplica las migraciones pendientes (tablas e índices)."""
+    done = database.upgrade()
+    click.echo("Aplicadas: " + ", ".join(done) if done else "Sin migraciones pendientes.")
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans_command():
+    """Verifica con EXPLAIN QUERY PLAN que las consultas calientes usan índices."""
+    failed = 0
+    for name, ok, plan in database.check_query_plans():
+        failed += not ok
+        click.echo(f"[{'OK' if ok else 'FALLA'}] {name}")
+        for line in plan:
+            click.echo(f"      {line}")
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command("recompute-stats")
+@with_appcontext
+def recompute_stats_command():
+    """Recalcula las estadísticas del catálogo desde productos (para cron)."""
+    rows = catalog_stats.recompute_stats()
+    db.session.commit()
+    click.echo(f"Estadísticas recalculadas ({rows} categorías).")
+
+
+@click.command("gc-uploads")
+@click.option("--min-age", type=int, default=3600, show_default=True, help="Segundos; protege subidas recientes.")
+@click.option("--dry-run", is_flag=True, help="Listar sin borrar.")
+@with_appcontext
+def gc_uploads_command(min_age, dry_run):
+    """Borra las imágenes subidas que ningún producto referencia."""
+    removed = uploads.collect_garbage(min_age=min_age, dry_run=dry_run)
+    for name in removed:
+        click.echo(name)
+    verb = "Sin referencias" if dry_run else "Borradas"
+    click.echo(f"{verb}: {len(removed)} imágenes.")
+
+
+@click.command("prune-carts")
+@click.option("--days", type=int, default=None, help="Antigüedad mínima (por defecto CART_MAX_AGE_DAYS).")
+@with_appcontext
+def prune_carts_command(days):
+    """Borra los carritos abandonados (para cron)."""
+    removed = prune_carts(days)
+    click.echo(f"Carritos borrados: {removed}.")
+
+
+@click.command("prerender")
+@with_appcontext
+def prerender_command():
+    """Escribe el HTML estático del home y de cada categoría (después de cada deploy)."""
+    started = time.perf_counter()
+    stats = prerender.build_all()
+    click.echo(
+        f"{stats['written']} escritas, {stats['unchanged']} sin cambios, {stats['removed']} borradas, "
+        f"{stats['failed']} errores en {time.perf_counter() - started:.1f}s -> {current_app.config['PRERENDER_FOLDER']}"
+    )
+    if stats["failed"]:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(backfill_images_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(prune_assets_command)
+    app.cli.add_command(import_catalog_command)
+    app.cli.add_command(export_catalog_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(recompute_stats_command)
+    app.cli.add_command(gc_uploads_command)
+    app.cli.add_command(prerender_command)
+    app.cli.add_command(prune_carts_command)
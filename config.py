@@ -1,5 +1,68 @@
 import os
 BASE_DIR=os.path.abspath(os.path.dirname(__file__))
 SECRET_KEY='cambia-esta-clave-en-produccion'
-SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(BASE_DIR,'faigothy.db')
+SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL','sqlite:///' + os.path.join(BASE_DIR,'faigothy.db'))
 SQLALCHEMY_TRACK_MODIFICATIONS=False
+
+# === Perfil SQLite de producción (ver database.py) ===
+# Varios workers de gunicorn comparten el archivo: WAL permite lectores
+# concurrentes con un escritor, y el busy timeout espera el lock en vez de
+# fallar con "database is locked".
+SQLITE_BUSY_TIMEOUT=15  # segundos
+SQLALCHEMY_ENGINE_OPTIONS={
+    'connect_args':{'timeout':SQLITE_BUSY_TIMEOUT,'check_same_thread':False},
+    'pool_size':10,
+    'max_overflow':20,
+    'pool_timeout':30,
+    'pool_recycle':3600,
+}
+SQLITE_PRAGMAS={
+    'journal_mode':'WAL',
+    'synchronous':'NORMAL',
+    'busy_timeout':SQLITE_BUSY_TIMEOUT*1000,
+    'cache_size':-64000,      # ~64 MB por conexión
+    'mmap_size':268435456,    # 256 MB
+    'temp_store':'MEMORY',
+}
+# Aplica las migraciones pendientes (índices, tablas nuevas) al arrancar
+AUTO_MIGRATE=True
+
+# === Hashing de contraseñas (ver passwords.py) ===
+# Cambiar el método rehace los hashes viejos en el próximo login.
+PASSWORD_HASH_METHOD='scrypt:32768:8:1'
+PASSWORD_HASH_WORKERS=2       # hilos dedicados por proceso
+PASSWORD_HASH_MAX_PENDING=8   # en vuelo + en espera; más => 429
+
+# === Identidad cacheada para el user_loader (ver identity.py) ===
+IDENTITY_CACHE_TTL=60  # segundos; cota de cuánto tarda otro worker en ver un cambio
+
+# === Métricas por request (ver metrics.py, /admin/metrics) ===
+METRICS_N_PLUS_ONE_THRESHOLD=5   # misma sentencia SQL N veces en un request
+METRICS_SLOW_REQUEST_MS=500
+METRICS_SLOW_SAMPLE_RATE=0.0     # 0 = log de lentos apagado; 0.1 = 1 de cada 10
+
+# === Caché HTTP de páginas públicas (ver http_cache.py) ===
+HTTP_CACHE_SHARED_MAX_AGE=30   # s-maxage para anónimos sin carrito
+
+# === Subidas (ver uploads.py) ===
+MAX_CONTENT_LENGTH=32*1024*1024   # tope del cuerpo del request (413); catálogos más grandes: flask import-catalog
+UPLOAD_CHUNK_SIZE=64*1024         # bloque de copia + hash
+
+# === Estadísticas del dashboard (ver catalog_stats.py) ===
+CATALOG_STATS_RECOMPUTE_SECONDS=3600   # recalculo completo contra la deriva; 0 = nunca desde el dashboard
+
+# === Sugerencias del buscador (ver suggest.py) ===
+SUGGEST_PRELOAD=True   # armar el índice en create_app(); si no, en la primera consulta
+SUGGEST_LIMIT=8
+
+# === HTML estático del home y las categorías (ver prerender.py) ===
+PRERENDER=False   # True: el admin regenera las páginas afectadas en cada cambio
+# PRERENDER_FOLDER=...          # por defecto instance/prerender (root de nginx)
+PRERENDER_BASE_URL='http://localhost'   # origen público para canonical/og:url
+
+# === Modo ASGI (ver asgi.py) ===
+ASGI_WSGI_THREADS=8   # hilos para lo que atiende Flask; las lecturas async no los usan
+
+# === Arranque en frío de los workers (ver startup.py) ===
+JINJA_BYTECODE_CACHE=True   # bytecode de templates en instance/jinja_cache, compartido entre workers
+TEMPLATE_WARMUP=True        # compilar/cargar todos los templates en create_app()
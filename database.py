@@ -0,0 +1,188 @@
+from sqlalchemy import event, text
+from sqlalchemy.dialects import sqlite
+from models import db, Producto, CatalogStats, Order, OrderLine, Cart, CartLine
+from catalog import admin_products_query, category_page_query, home_shelves_query, price_bucket
+import search_index
+import catalog_stats
+
+# Perfil SQLite de producción: pragmas por conexión, migraciones idempotentes
+# (índices de las consultas calientes) y un chequeo con EXPLAIN QUERY PLAN de
+# que esas consultas realmente usan los índices.
+
+
+def pragma_listener(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return on_connect
+
+
+def init_database(app):
+    app.config.setdefault("SQLITE_PRAGMAS", {})
+    app.config.setdefault("AUTO_MIGRATE", False)
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite" and app.config["SQLITE_PRAGMAS"]:
+            event.listen(db.engine, "connect", pragma_listener(app.config["SQLITE_PRAGMAS"]))
+        if app.config["AUTO_MIGRATE"]:
+            upgrade()
+
+
+# ----------------- Migraciones -----------------
+# (id, sentencias). Solo se agregan al final; cada id se aplica una vez.
+MIGRATIONS = [
+    ("0001_create_tables", [db.create_all]),
+    (
+        "0002_hot_query_indexes",
+        [
+            # home (ROW_NUMBER por categoría de productos activos) y búsqueda
+            "CREATE INDEX IF NOT EXISTS ix_productos_activo_categoria_id "
+            "ON productos (activo, categoria_id, id)",
+            # admin: filtro por categoría paginado por id
+            "CREATE INDEX IF NOT EXISTS ix_productos_categoria_id "
+            "ON productos (categoria_id, id)",
+            # admin: nombre empieza con... (LIKE 'x%' es case-insensitive)
+            "CREATE INDEX IF NOT EXISTS ix_productos_nombre_nocase "
+            "ON productos (nombre COLLATE NOCASE)",
+            # import: producto existente por (categoría, nombre)
+            "CREATE INDEX IF NOT EXISTS ix_productos_categoria_nombre "
+            "ON productos (categoria_id, nombre)",
+        ],
+    ),
+    ("0003_search_index", [search_index.ensure_index]),
+    (
+        "0004_catalog_stats",
+        [
+            lambda: CatalogStats.__table__.create(db.session.connection(), checkfirst=True),
+            catalog_stats.recompute_stats,
+        ],
+    ),
+    (
+        "0005_orders_and_stock",
+        [
+            lambda: _add_column("productos", "stock", "INTEGER"),
+            lambda: Order.__table__.create(db.session.connection(), checkfirst=True),
+            lambda: OrderLine.__table__.create(db.session.connection(), checkfirst=True),
+        ],
+    ),
+    (
+        "0006_category_browse_indexes",
+        [
+            # /categoria/<slug> por precio (asc/desc) y filtro de rango; cubre
+            # también el conteo de los filtros (ver catalog.category_facets).
+            # "Más nuevos" usa ix_productos_activo_categoria_id.
+            "CREATE INDEX IF NOT EXISTS ix_productos_activo_categoria_precio "
+            "ON productos (activo, categoria_id, precio, id)",
+        ],
+    ),
+    (
+        "0007_carts_updated_at_index",
+        [
+            # Bases viejas: carts se creaba recién en el primer uso del store
+            lambda: Cart.__table__.create(db.session.connection(), checkfirst=True),
+            lambda: CartLine.__table__.create(db.session.connection(), checkfirst=True),
+            # flask prune-carts: carritos abandonados por antigüedad
+            "CREATE INDEX IF NOT EXISTS ix_carts_updated_at ON carts (updated_at)",
+        ],
+    ),
+]
+
+
+def _add_column(table, column, ddl):
+    # Las bases nuevas ya la tienen (0001 crea las tablas desde los modelos)
+    columns = {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _ensure_migrations_table():
+    db.session.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " id VARCHAR(120) PRIMARY KEY,"
+            " applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    db.session.commit()
+
+
+def upgrade():
+    """Aplica las migraciones pendientes; devuelve los ids aplicados."""
+    _ensure_migrations_table()
+    applied = set(db.session.execute(text("SELECT id FROM schema_migrations")).scalars())
+    done = []
+    for migration_id, steps in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        for step in steps:
+            if callable(step):
+                step()
+            else:
+                db.session.execute(text(step))
+        # OR IGNORE: otro worker pudo aplicarla al mismo tiempo
+        db.session.execute(
+            text("INSERT OR IGNORE INTO schema_migrations (id) VALUES (:id)"),
+            {"id": migration_id},
+        )
+        db.session.commit()
+        done.append(migration_id)
+    return done
+
+
+# ----------------- Planes de consulta -----------------
+def _hot_queries():
+    return [
+        (
+            "home: estantes",
+            home_shelves_query().statement,
+            # Las dos cubren (activo, categoria_id, id); el planner elige
+            ("ix_productos_activo_categoria_id", "ix_productos_activo_categoria_precio"),
+        ),
+        (
+            "admin: listado por categoría",
+            admin_products_query(categoria=1).limit(51).statement,
+            "ix_productos_categoria_id",
+        ),
+        (
+            "admin: nombre empieza con",
+            admin_products_query(q="Aro").limit(51).statement,
+            "ix_productos_nombre_nocase",
+        ),
+        (
+            "categoría: más nuevos",
+            category_page_query(1).limit(49).statement,
+            "ix_productos_activo_categoria_id",
+        ),
+        (
+            "categoría: por precio, rango y cursor",
+            category_page_query(1, "precio_desc", price_bucket("25000-50000"), (30000.0, 10)).limit(49).statement,
+            "ix_productos_activo_categoria_precio",
+        ),
+        (
+            "checkout: precios del carrito",
+            db.select(Producto.id, Producto.precio).where(Producto.id.in_([1, 2, 3])),
+            "INTEGER PRIMARY KEY",
+        ),
+    ]
+
+
+def query_plan(statement):
+    sql = str(
+        statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
+    )
+    rows = db.session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """Devuelve [(nombre, ok, plan)] para cada consulta caliente."""
+    results = []
+    for name, statement, expected in _hot_queries():
+        plan = query_plan(statement)
+        if isinstance(expected, str):
+            expected = (expected,)
+        ok = any(index in line for line in plan for index in expected)
+        results.append((name, ok, plan))
+    return results
@@ -0,0 +1,101 @@
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, request, session
+from flask_login import current_user
+from catalog_cache import catalog_version
+from cart_utils import cart_qty, current_cart_id
+
+# ETag / 304 para las páginas públicas del catálogo.
+#
+# El HTML de /, /search, etc. depende de: la versión del catálogo, el deploy
+# (templates y assets), la URL con su query string y lo que cambia por
+# visitante en el layout (login, admin, cantidad del carrito). Con eso se
+# arma un ETag fuerte *antes* de renderizar; si coincide con If-None-Match se
+# responde 304 sin tocar los templates.
+#
+# Los anónimos sin carrito ven todos lo mismo: esas respuestas salen como
+# public con s-maxage para que un cache compartido delante de la app las
+# sirva. El resto es private. Siempre se revalida (no-cache / max-age=0) y
+# Vary: Cookie separa a los visitantes con sesión.
+
+
+def _deploy_id(app):
+    """Huella de templates + manifiesto de assets; igual en todos los workers."""
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, folder)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    manifest = os.path.join(app.config.get("ASSET_DIST_FOLDER", ""), "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:12]
+
+
+def init_http_cache(app):
+    app.config.setdefault("HTTP_CACHE_ENABLED", True)
+    app.config.setdefault("HTTP_CACHE_SHARED_MAX_AGE", 30)
+    app.config.setdefault("HTTP_CACHE_DEPLOY_ID", _deploy_id(app))
+
+
+def viewer_key(user_id, is_admin):
+    return "anon" if user_id is None else f"u{user_id}{'a' if is_admin else ''}"
+
+
+def make_etag(config, version, full_path, viewer, qty):
+    raw = f"{config['HTTP_CACHE_DEPLOY_ID']}|{version}|{full_path}|{viewer}|{qty}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def cache_control_for(config, viewer, qty):
+    # Anónimo sin carrito: la misma página para todos => cache compartido
+    if viewer == "anon" and not qty:
+        return f"public, max-age=0, s-maxage={config['HTTP_CACHE_SHARED_MAX_AGE']}"
+    return "private, no-cache"
+
+
+def _viewer():
+    """Lo que el layout muestra distinto según quién mira."""
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    viewer = viewer_key(user_id, current_user.is_admin)
+    qty = cart_qty() if current_cart_id() else 0
+    return viewer, qty
+
+
+def conditional(view):
+    """Decorador para vistas GET públicas: ETag fuerte + 304 sin renderizar."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        if not config["HTTP_CACHE_ENABLED"] or request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+        # Mensajes flash pendientes: la página es única, no la cachea nadie
+        if "_flashes" in session:
+            response = current_app.make_response(view(*args, **kwargs))
+            response.cache_control.no_store = True
+            response.vary.add("Cookie")
+            return response
+
+        viewer, qty = _viewer()
+        etag = make_etag(config, catalog_version(), request.full_path, viewer, qty)
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control_for(config, viewer, qty)
+        response.vary.add("Cookie")
+        return response
+
+    # asgi.py responde los 304 de estas vistas sin pasar por Flask
+    wrapper.conditional = True
+    return wrapper
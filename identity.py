@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask_login import AnonymousUserMixin, UserMixin, user_logged_out
+from sqlalchemy import event, select
+from models import db, User
+
+# Identidad del usuario logueado sin ir a la base en cada request.
+#
+# flask_login llama al user_loader en todos los requests autenticados; antes
+# eso era un User.query.get() solo para leer nombre/email. Ahora el loader
+# devuelve un Identity (id, nombre, email, is_admin ya calculado) desde una
+# caché por proceso con TTL corto. Se invalida al hacer logout y cuando se
+# modifica o borra el User en este proceso; en los demás workers el TTL acota
+# cuánto puede durar un dato viejo.
+
+
+class Identity(UserMixin):
+    def __init__(self, id, nombre, email, is_admin):
+        self.id = id
+        self.nombre = nombre
+        self.email = email
+        self.is_admin = is_admin
+
+
+class AnonymousIdentity(AnonymousUserMixin):
+    is_admin = False
+
+
+class IdentityCache:
+    """id -> Identity con TTL y tope de entradas (descarta las más viejas)."""
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries=None, ttl=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[1]
+
+    def set(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def _make_identity(id, nombre, email):
+    admins = current_app.config.get("ADMIN_EMAILS", set())
+    return Identity(id, nombre, email, email in admins)
+
+
+def identity_for(user):
+    """Identity de un User ya cargado (login/registro); queda cacheada."""
+    identity = _make_identity(user.id, user.nombre, user.email)
+    identity_cache.set(identity)
+    return identity
+
+
+def load_identity(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    identity = identity_cache.get(user_id)
+    if identity is not None:
+        return identity
+    row = db.session.execute(
+        select(User.id, User.nombre, User.email).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    identity = _make_identity(row.id, row.nombre, row.email)
+    identity_cache.set(identity)
+    return identity
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    identity_cache.forget(target.id)
+
+
+def _on_logout(app, user):
+    if user is not None and user.get_id() is not None:
+        identity_cache.forget(int(user.get_id()))
+
+
+def init_identity(app, login_manager):
+    app.config.setdefault("IDENTITY_CACHE_TTL", 60)
+    app.config.setdefault("IDENTITY_CACHE_MAX_ENTRIES", 10000)
+    identity_cache.configure(
+        max_entries=app.config["IDENTITY_CACHE_MAX_ENTRIES"],
+        ttl=app.config["IDENTITY_CACHE_TTL"],
+    )
+    login_manager.user_loader(load_identity)
+    login_manager.anonymous_user = AnonymousIdentity
+    user_logged_out.connect(_on_logout, app)
@@ -0,0 +1,199 @@
+import base64
+import io
+import json
+import logging
+import os
+import threading
+import time
+from flask import current_app, url_for
+from catalog_cache import bump_catalog_version
+
+# Derivados responsive de las fotos de productos: varios anchos en WebP/AVIF
+# y un placeholder borroso diminuto (data URI). Se generan fuera del request
+# en un pool de procesos; los templates usan image_sources() para armar el
+# <picture> con srcset/sizes y caen al original mientras no existan.
+#
+# Estructura: static/img/derivatives/<imagen sin extensión>/<ancho>.<formato>
+# más meta.json con los anchos generados y el placeholder.
+
+log = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivatives"
+DEFAULT_WIDTHS = (320, 640, 960)
+DEFAULT_FORMATS = ("avif", "webp")
+SOURCE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "avif"}
+PLACEHOLDER_WIDTH = 16
+# speed alto en AVIF: el encoder por defecto tarda varios segundos por imagen
+SAVE_OPTIONS = {
+    "avif": {"format": "AVIF", "quality": 60, "speed": 8},
+    "webp": {"format": "WEBP", "quality": 72, "method": 4},
+}
+META_RECHECK_SECONDS = 30.0
+
+_pool = None
+_pool_lock = threading.Lock()
+_meta_cache = {}
+
+
+def init_images(app):
+    app.config.setdefault("IMAGE_DERIVATIVES", True)
+    app.config.setdefault("IMAGE_WIDTHS", DEFAULT_WIDTHS)
+    app.config.setdefault("IMAGE_FORMATS", DEFAULT_FORMATS)
+    app.config.setdefault("IMAGE_WORKERS", 2)
+    app.jinja_env.globals["image_sources"] = image_sources
+
+
+def derivative_dir(upload_folder, filename):
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(upload_folder, DERIVATIVES_DIR, stem)
+
+
+# ----------------- Generación (corre en los procesos del pool) -----------------
+def generate_derivatives(src_path, out_dir, widths, formats):
+    """Genera los derivados de ``src_path`` en ``out_dir`` y escribe meta.json."""
+    from PIL import Image, ImageFilter, ImageOps, features
+
+    formats = [fmt for fmt in formats if fmt in SAVE_OPTIONS and features.check(fmt)]
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+        width, height = im.size
+
+        produced = []
+        for target in sorted(set(min(w, width) for w in widths)):
+            resized = im if target == width else im.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            for fmt in formats:
+                resized.save(os.path.join(out_dir, f"{target}.{fmt}"), **SAVE_OPTIONS[fmt])
+            produced.append(target)
+
+        tiny = im.convert("RGB").resize(
+            (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR
+        ).filter(ImageFilter.GaussianBlur(1))
+        buf = io.BytesIO()
+        tiny.save(buf, format="JPEG", quality=40)
+        placeholder = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    meta = {
+        "width": width,
+        "height": height,
+        "widths": produced,
+        "formats": formats,
+        "placeholder": placeholder,
+        "source_mtime": os.path.getmtime(src_path),
+    }
+    tmp = os.path.join(out_dir, "meta.json.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))
+    return src_path
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Import diferido: solo lo necesita quien sube imágenes (admin)
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn: no heredar locks/hilos del worker web (fork + threads)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _on_done(app, filename):
+    def callback(future):
+        exc = future.exception()
+        if exc is not None:
+            log.error("No se pudieron generar los derivados de %s: %s", filename, exc)
+            return
+        # Los estantes cacheados se renderizaron sin srcset: invalidarlos
+        _meta_cache.pop(filename, None)
+        with app.app_context():
+            bump_catalog_version()
+
+    return callback
+
+
+def enqueue_derivatives(filename):
+    """Encola la generación de derivados de una imagen subida; no bloquea."""
+    app = current_app._get_current_object()
+    if not filename or not app.config.get("IMAGE_DERIVATIVES"):
+        return None
+    folder = app.config["UPLOAD_FOLDER"]
+    future = _get_pool(app.config["IMAGE_WORKERS"]).submit(
+        generate_derivatives,
+        os.path.join(folder, filename),
+        derivative_dir(folder, filename),
+        tuple(app.config["IMAGE_WIDTHS"]),
+        tuple(app.config["IMAGE_FORMATS"]),
+    )
+    future.add_done_callback(_on_done(app, filename))
+    return future
+
+
+def needs_derivatives(upload_folder, filename):
+    meta_path = os.path.join(derivative_dir(upload_folder, filename), "meta.json")
+    try:
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return True
+    return meta.get("source_mtime") != os.path.getmtime(os.path.join(upload_folder, filename))
+
+
+def source_images(upload_folder):
+    """Imágenes originales de la carpeta de uploads (sin los derivados)."""
+    for root, dirs, files in os.walk(upload_folder):
+        if root == upload_folder and DERIVATIVES_DIR in dirs:
+            dirs.remove(DERIVATIVES_DIR)
+        for name in sorted(files):
+            if name.rsplit(".", 1)[-1].lower() in SOURCE_EXTENSIONS:
+                yield os.path.relpath(os.path.join(root, name), upload_folder)
+
+
+# ----------------- Templates -----------------
+def _load_meta(upload_folder, filename):
+    now = time.monotonic()
+    cached = _meta_cache.get(filename)
+    if cached and (cached[1] is not None or now - cached[0] < META_RECHECK_SECONDS):
+        return cached[1]
+    meta_path = os.path.join(derivative_dir(upload_folder, filename), "meta.json")
+    try:
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        meta = None
+    _meta_cache[filename] = (now, meta)
+    return meta
+
+
+def image_sources(filename):
+    """srcset por formato + placeholder para una imagen de producto.
+
+    Devuelve None si la imagen es externa o todavía no tiene derivados.
+    """
+    if not filename or filename.startswith(("http://", "https://")):
+        return None
+    meta = _load_meta(current_app.config["UPLOAD_FOLDER"], filename)
+    if not meta:
+        return None
+    stem = os.path.splitext(filename)[0].replace(os.sep, "/")
+    base = f"img/{DERIVATIVES_DIR}/{stem}"
+    sources = []
+    for fmt in meta["formats"]:
+        srcset = ", ".join(
+            f"{url_for('static', filename=f'{base}/{w}.{fmt}')} {w}w" for w in meta["widths"]
+        )
+        sources.append({"type": f"image/{fmt}", "srcset": srcset})
+    return {
+        "sources": sources,
+        "placeholder": meta["placeholder"],
+        "width": meta["width"],
+        "height": meta["height"],
+    }
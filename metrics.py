@@ -0,0 +1,246 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from models import db
+from catalog_cache import catalog_cache
+
+# Instrumentación por request: tiempo total, tiempo de templates, cantidad y
+# tiempo de consultas SQL, y detección de N+1 (la misma sentencia repetida
+# muchas veces en un request). Se agrega en histogramas por endpoint que
+# /admin/metrics expone en formato de texto de Prometheus.
+#
+# Las métricas son por proceso: con varios workers cada uno reporta las suyas.
+# El log de requests lentos es opcional (METRICS_SLOW_SAMPLE_RATE > 0) y
+# muestreado para no inundar el log justo cuando el sitio está lento.
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger("faigothy.slow")
+
+PREFIX = "faigothy"
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histogramas y contadores etiquetados, protegidos por un lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def histogram(self, name, help_text, buckets):
+        self._help[name] = ("histogram", help_text, buckets)
+
+    def counter(self, name, help_text):
+        self._help[name] = ("counter", help_text, None)
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self._help[name][2])
+            hist.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self, extra=()):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._help.items()):
+            full = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "counter":
+                for (cname, labels), value in counters:
+                    if cname == name:
+                        lines.append(f"{full}{_labels(labels)} {value}")
+                continue
+            for (hname, labels), hist in histograms:
+                if hname != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', _num(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{full}_sum{_labels(labels)} {_num(hist.sum)}")
+                lines.append(f"{full}_count{_labels(labels)} {hist.count}")
+        for name, kind, help_text, value in extra:
+            full = f"{PREFIX}_{name}"
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} {kind}", f"{full} {_num(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+registry = Registry()
+registry.histogram("request_duration_seconds", "Tiempo total del request.", TIME_BUCKETS)
+registry.histogram("template_render_seconds", "Tiempo en render_template por request.", TIME_BUCKETS)
+registry.histogram("sql_duration_seconds", "Tiempo en consultas SQL por request.", TIME_BUCKETS)
+registry.histogram("sql_statements", "Consultas SQL por request.", COUNT_BUCKETS)
+registry.counter("requests_total", "Requests atendidos.")
+registry.counter("n_plus_one_total", "Requests con una misma sentencia SQL repetida.")
+
+
+# ----------------- SQL -----------------
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    perf = g.get("_perf") if has_request_context() else None
+    if perf is None:
+        return
+    perf["sql_time"] += time.perf_counter() - started
+    perf["statements"][statement] += 1
+
+
+# ----------------- Templates -----------------
+def _before_render(app, template, context, **extra):
+    perf = g.get("_perf")
+    if perf is not None:
+        perf["template_stack"].append(time.perf_counter())
+
+
+def _after_render(app, template, context, **extra):
+    perf = g.get("_perf")
+    if perf is not None and perf["template_stack"]:
+        started = perf["template_stack"].pop()
+        # Un render_template dentro de otro no se cuenta dos veces
+        if not perf["template_stack"]:
+            perf["template_time"] += time.perf_counter() - started
+
+
+# ----------------- Request -----------------
+def _start_request():
+    g._perf = {
+        "start": time.perf_counter(),
+        "sql_time": 0.0,
+        "statements": Counter(),
+        "template_time": 0.0,
+        "template_stack": [],
+        "status": 500,
+    }
+
+
+def _mark_status(response):
+    perf = g.get("_perf")
+    if perf is not None:
+        perf["status"] = response.status_code
+    return response
+
+
+def _finish_request(app):
+    def finish(exc):
+        perf = g.pop("_perf", None)
+        if perf is None:
+            return
+        wall = time.perf_counter() - perf["start"]
+        endpoint = request.endpoint or "unknown"
+        labels = (("endpoint", endpoint),)
+        statements = perf["statements"]
+        sql_count = sum(statements.values())
+        registry.observe("request_duration_seconds", labels, wall)
+        registry.observe("template_render_seconds", labels, perf["template_time"])
+        registry.observe("sql_duration_seconds", labels, perf["sql_time"])
+        registry.observe("sql_statements", labels, sql_count)
+        registry.inc("requests_total", labels + (("status", perf["status"]),))
+
+        repeated = [
+            (sql, n) for sql, n in statements.items() if n >= app.config["METRICS_N_PLUS_ONE_THRESHOLD"]
+        ]
+        if repeated:
+            registry.inc("n_plus_one_total", labels)
+            sql, n = max(repeated, key=lambda item: item[1])
+            log.warning("Posible N+1 en %s: %d veces %s", endpoint, n, " ".join(sql.split())[:200])
+
+        rate = app.config["METRICS_SLOW_SAMPLE_RATE"]
+        if rate and wall * 1000 >= app.config["METRICS_SLOW_REQUEST_MS"] and random.random() < rate:
+            slow_log.warning(
+                "%s %s %.0fms status=%s sql=%d/%.0fms templates=%.0fms top=%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                wall * 1000,
+                perf["status"],
+                sql_count,
+                perf["sql_time"] * 1000,
+                perf["template_time"] * 1000,
+                [(n, " ".join(sql.split())[:120]) for sql, n in statements.most_common(3)],
+            )
+
+    return finish
+
+
+def render_metrics():
+    stats = catalog_cache.stats()
+    extra = [
+        ("catalog_cache_hits_total", "counter", "Aciertos de la caché del catálogo.", stats["hits"]),
+        ("catalog_cache_misses_total", "counter", "Fallos de la caché del catálogo.", stats["misses"]),
+        ("catalog_cache_entries", "gauge", "Entradas en la caché del catálogo.", stats["entries"]),
+    ]
+    # Arranque del worker (ver startup.py)
+    startup = current_app.extensions.get("startup", {})
+    for phase, help_text in (
+        ("import", "Imports hasta create_app()."),
+        ("init", "create_app() completo, con el warm-up de templates."),
+        ("warmup", "Warm-up de templates."),
+        ("first_request", "Primer request atendido por el worker."),
+    ):
+        if phase in startup:
+            extra.append((f"startup_{phase}_seconds", "gauge", help_text, startup[phase]))
+    return registry.render(extra)
+
+
+def init_metrics(app):
+    app.config.setdefault("METRICS_ENABLED", True)
+    app.config.setdefault("METRICS_N_PLUS_ONE_THRESHOLD", 5)
+    app.config.setdefault("METRICS_SLOW_REQUEST_MS", 500)
+    app.config.setdefault("METRICS_SLOW_SAMPLE_RATE", 0.0)
+    if not app.config["METRICS_ENABLED"]:
+        return
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_mark_status)
+    app.teardown_request(_finish_request(app))
@@ -1,7 +1,8 @@
+from datetime import datetime
 from decimal import Decimal
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password
 
 db = SQLAlchemy()
 
@@ -13,10 +14,11 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
 
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        # Corre en el pool de passwords.py; puede lanzar HashingBusy
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
 class Categoria(db.Model):
     __tablename__ = "categorias"
@@ -35,6 +37,71 @@ class Producto(db.Model):
     precio = db.Column(db.Numeric(12, 2), nullable=False, default=0)
     categoria_id = db.Column(db.Integer, db.ForeignKey("categorias.id"))
     activo = db.Column(db.Boolean, default=True)
+    # NULL = sin control de stock (piezas a pedido); los pedidos lo descuentan
+    # con un UPDATE condicional (ver orders.py)
+    stock = db.Column(db.Integer)
 
     def precio_float(self) -> float:
         return float(self.precio or Decimal("0"))
+
+class CatalogVersion(db.Model):
+    # Fila única compartida entre workers; el admin la incrementa en cada cambio
+    __tablename__ = "catalog_version"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class CatalogStats(db.Model):
+    # Una fila por categoría (0 = sin categoría), mantenida por catalog_stats.py
+    # al escribir productos; el dashboard solo lee estas filas.
+    __tablename__ = "catalog_stats"
+    categoria_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    productos = db.Column(db.Integer, nullable=False, default=0)
+    activos = db.Column(db.Integer, nullable=False, default=0)
+    # Precios de los productos activos
+    precio_suma = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    precio_min = db.Column(db.Numeric(12, 2))
+    precio_max = db.Column(db.Numeric(12, 2))
+    recomputed_at = db.Column(db.DateTime)
+
+class Cart(db.Model):
+    # Carrito server-side: la cookie solo guarda el id. qty/total se mantienen
+    # al escribir para que leer el resumen sea una sola fila.
+    __tablename__ = "carts"
+    id = db.Column(db.String(32), primary_key=True)
+    qty = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class CartLine(db.Model):
+    __tablename__ = "cart_lines"
+    __table_args__ = (db.UniqueConstraint("cart_id", "producto_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.String(32), db.ForeignKey("carts.id"), nullable=False)
+    producto_id = db.Column(db.Integer, nullable=False)
+    nombre = db.Column(db.String(200), nullable=False)
+    precio = db.Column(db.Numeric(12, 2), nullable=False)
+    qty = db.Column(db.Integer, nullable=False)
+
+class Order(db.Model):
+    # Pedido confirmado. (user_id, idempotency_key) es único: reintentar el
+    # mismo submit devuelve el pedido ya creado en vez de duplicarlo.
+    __tablename__ = "orders"
+    __table_args__ = (db.UniqueConstraint("user_id", "idempotency_key"),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    total = db.Column(db.Numeric(12, 2), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    lines = db.relationship("OrderLine", backref="order", lazy="selectin", cascade="all, delete-orphan")
+
+class OrderLine(db.Model):
+    __tablename__ = "order_lines"
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True)
+    producto_id = db.Column(db.Integer, nullable=False)
+    # Nombre y precio al momento de la compra
+    nombre = db.Column(db.String(200), nullable=False)
+    precio = db.Column(db.Numeric(12, 2), nullable=False)
+    qty = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,117 @@
+from decimal import Decimal
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, Producto, Order, OrderLine
+from pricing import OK, PRICE_CHANGED
+
+# Confirmación de pedidos pensada para picos (lanzamientos): el stock se
+# reserva con un UPDATE condicional por línea,
+#
+#     UPDATE productos SET stock = stock - :qty
+#     WHERE id = :id AND activo AND (stock IS NULL OR stock >= :qty)
+#     RETURNING nombre, precio
+#
+# sin leer-y-después-escribir, así dos compradores no pueden llevarse la
+# misma unidad. Todas las líneas + el pedido van en una sola transacción
+# corta (en SQLite: un solo lock de escritura, sin lecturas previas que
+# puedan quedar viejas); si una línea no alcanza se deshace todo.
+#
+# Cada submit trae una clave de idempotencia (campo oculto del checkout o
+# header Idempotency-Key): (user_id, clave) es único en orders, así que un
+# reintento (doble click, red que se corta) devuelve el pedido original.
+#
+# Las líneas van ordenadas por id de producto: con otro motor de base, dos
+# pedidos con los mismos productos toman los locks en el mismo orden.
+
+
+class CheckoutError(Exception):
+    """Error para mostrarle al comprador; no se reservó nada."""
+
+
+class EmptyOrder(CheckoutError):
+    pass
+
+
+class OutOfStock(CheckoutError):
+    pass
+
+
+class PriceChanged(CheckoutError):
+    pass
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def find_order(user_id, idempotency_key):
+    return db.session.execute(
+        select(Order).where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+    ).scalar()
+
+
+def _reserve(product_id, qty):
+    return db.session.execute(
+        update(Producto)
+        .where(
+            Producto.id == product_id,
+            Producto.activo.is_(True),
+            or_(Producto.stock.is_(None), Producto.stock >= qty),
+        )
+        .values(stock=Producto.stock - qty)
+        .returning(Producto.nombre, Producto.precio)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+
+def _unavailable(product_id, name):
+    row = db.session.execute(
+        select(Producto.nombre, Producto.activo, Producto.stock).where(Producto.id == product_id)
+    ).first()
+    if row is None or not row.activo:
+        return OutOfStock(f"{name} ya no está disponible.")
+    return OutOfStock(f"No queda stock suficiente de {row.nombre} (quedan {row.stock}).")
+
+
+def place_order(user_id, idempotency_key, items, expected_total=None):
+    """Crea el pedido de ``items`` (de priced_cart) reservando stock.
+
+    Devuelve ``(order, created)``; ``created`` es False si la clave ya se
+    había usado. ``expected_total`` es el total que vio el comprador: si los
+    precios cambiaron mientras tanto se lanza PriceChanged y no se reserva.
+    """
+    order = find_order(user_id, idempotency_key)
+    if order is not None:
+        return order, False
+    lines = sorted(
+        (int(pid), item["qty"], item["name"])
+        for pid, item in items.items()
+        if item["status"] in (OK, PRICE_CHANGED) and item["qty"] > 0
+    )
+    if not lines:
+        raise EmptyOrder("No hay productos disponibles en el carrito.")
+
+    try:
+        order = Order(user_id=user_id, idempotency_key=idempotency_key, total=Decimal("0"))
+        for product_id, qty, name in lines:
+            row = _reserve(product_id, qty)
+            if row is None:
+                raise _unavailable(product_id, name)
+            precio = _money(row.precio)
+            order.lines.append(OrderLine(producto_id=product_id, nombre=row.nombre, precio=precio, qty=qty))
+            order.total += precio * qty
+        if expected_total is not None and order.total != _money(expected_total):
+            raise PriceChanged("Los precios cambiaron; revisá el total antes de confirmar.")
+        db.session.add(order)
+        db.session.commit()
+    except IntegrityError:
+        # Otro request con la misma clave ganó la carrera: su pedido vale
+        db.session.rollback()
+        order = find_order(user_id, idempotency_key)
+        if order is None:
+            raise
+        return order, False
+    except BaseException:
+        db.session.rollback()
+        raise
+    return order, True
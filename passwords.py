@@ -0,0 +1,112 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hashing de contraseñas fuera del hilo del request. scrypt/pbkdf2 cuestan
+# decenas de ms de CPU a propósito; una ráfaga de logins ocupaba todos los
+# workers y frenaba el catálogo. Acá corren en un pool chico (hashlib suelta
+# el GIL, así que los hilos alcanzan) con admisión acotada: si ya hay
+# PASSWORD_HASH_MAX_PENDING trabajos en vuelo se rechaza enseguida con
+# HashingBusy (la ruta responde 429) en vez de encolar sin límite.
+#
+# PASSWORD_HASH_METHOD fija el costo (formato de werkzeug, p. ej.
+# "scrypt:32768:8:1" o "pbkdf2:sha256:600000"); los hashes con otros
+# parámetros se rehacen en el próximo login correcto.
+
+log = logging.getLogger(__name__)
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HashingBusy(Exception):
+    """El pool de hashing está saturado; reintentar más tarde."""
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, workers=2, max_pending=8):
+        self.method = method
+        self.workers = workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash") if workers else None
+        )
+        self._slots = threading.BoundedSemaphore(max(max_pending, workers, 1))
+        self._prefix = None
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # El cupo se libera cuando termina el hash, no cuando el request deja de esperar
+        future.add_done_callback(lambda f: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    @property
+    def prefix(self):
+        # "scrypt" a secas se expande a "scrypt:32768:8:1": comparar con lo que genera werkzeug
+        if self._prefix is None:
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split("$", 1)[0] != self.prefix
+
+
+def init_passwords(app):
+    app.config.setdefault("PASSWORD_HASH_METHOD", DEFAULT_METHOD)
+    app.config.setdefault("PASSWORD_HASH_WORKERS", 2)
+    app.config.setdefault("PASSWORD_HASH_MAX_PENDING", 8)
+    app.extensions["password_hasher"] = PasswordHasher(
+        app.config["PASSWORD_HASH_METHOD"],
+        app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_PENDING"],
+    )
+
+
+def _hasher():
+    if has_app_context():
+        hasher = current_app.extensions.get("password_hasher")
+        if hasher is not None:
+            return hasher
+    # Fuera de la app (scripts sueltos): inline con los parámetros por defecto
+    return PasswordHasher(workers=0)
+
+
+def hash_password(password):
+    return _hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    return _hasher().verify(pwhash, password)
+
+
+def rehash_if_needed(user, password):
+    """Rehace el hash de ``user`` si cambió PASSWORD_HASH_METHOD.
+
+    Devuelve True si lo actualizó (falta el commit). Con el pool saturado no
+    pasa nada: se reintenta en el próximo login.
+    """
+    hasher = _hasher()
+    if not hasher.needs_rehash(user.password_hash):
+        return False
+    try:
+        user.password_hash = hasher.hash(password)
+    except HashingBusy:
+        log.info("Pool de hashing saturado; rehash de %s postergado", user.id)
+        return False
+    return True
@@ -0,0 +1,164 @@
+import gzip
+import os
+import tempfile
+from flask import current_app, g
+from sqlalchemy import select
+from models import db, Categoria
+
+# Pre-render del home y de las páginas de categoría a HTML estático.
+#
+# Para los anónimos el home y /categoria/<slug> son la misma página: con
+# PRERENDER activo se escriben en PRERENDER_FOLDER como
+#
+#     index.html                    <- /
+#     categoria/<slug>/index.html   <- /categoria/<slug>
+#
+# (más un .gz al lado para gzip_static) y nginx o el CDN los sirve sin pasar
+# por la app. Lo que cambia por visitante no va en el HTML: el layout se
+# renderiza "neutral" (badge del carrito vacío, botones de sesión de los dos
+# estados) y app.js lo completa con una llamada a /hydrate (cantidad del
+# carrito, sesión, admin y los flash pendientes, que se muestran como toast).
+#
+# Regeneración incremental: el admin llama a refresh() después de cada
+# cambio con las categorías tocadas; se re-renderiza el home y esas
+# categorías, nada más. Un archivo solo se reescribe si el HTML cambió (el
+# mtime/ETag de nginx se mantiene) y siempre con rename atómico. Si un
+# render falla se borra el archivo viejo: nginx cae a la app en vez de
+# servir algo desactualizado. `flask prerender` rehace todo (deploy, import).
+#
+# nginx, con la app en @app (las URLs con query string siempre van a la app):
+#
+#     location = / {
+#         if ($args) { proxy_pass http://app; }
+#         root /srv/faigothy/instance/prerender; try_files /index.html @app;
+#     }
+#     location /categoria/ {
+#         if ($args) { proxy_pass http://app; }
+#         root /srv/faigothy/instance/prerender; try_files $uri/index.html @app;
+#     }
+
+
+def init_prerender(app):
+    app.config.setdefault("PRERENDER", False)
+    app.config.setdefault("PRERENDER_FOLDER", os.path.join(app.instance_path, "prerender"))
+    # Origen público: lo usan el canonical y las URLs absolutas del layout
+    app.config.setdefault("PRERENDER_BASE_URL", "http://localhost")
+
+
+def is_prerendering():
+    return g.get("prerender", False)
+
+
+def _page_path(folder, slug=None):
+    if slug is None:
+        return os.path.join(folder, "index.html")
+    return os.path.join(folder, "categoria", slug, "index.html")
+
+
+def _write(path, html):
+    """Escribe si cambió; devuelve True si el archivo se reescribió."""
+    data = html.encode("utf-8")
+    try:
+        with open(path, "rb") as fh:
+            if fh.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    for target, payload in ((path + ".gz", gzip.compress(data, compresslevel=9, mtime=0)), (path, data)):
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".prerender-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(payload)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    return True
+
+
+def _remove(path):
+    for target in (path, path + ".gz"):
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def render_page(app, url):
+    """HTML de ``url`` tal como lo vería un anónimo sin carrito."""
+    # Contexto de app propio: g, la sesión de la DB y el usuario de
+    # Flask-Login no se comparten con el request del admin que lo dispara
+    with app.app_context(), app.test_request_context(url, base_url=app.config["PRERENDER_BASE_URL"]):
+        g.prerender = True
+        response = app.full_dispatch_request()
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: HTTP {response.status_code}")
+        return response.get_data(as_text=True)
+
+
+def _slugs(category_ids=None):
+    query = select(Categoria.id, Categoria.slug).where(Categoria.slug.is_not(None), Categoria.slug != "")
+    if category_ids is not None:
+        query = query.where(Categoria.id.in_(category_ids))
+    # El slug termina siendo un directorio: nada de "/" ni ".."
+    return [slug for _, slug in db.session.execute(query) if "/" not in slug and slug not in (".", "..")]
+
+
+def _render_to(app, folder, slug, stats):
+    url = "/" if slug is None else f"/categoria/{slug}"
+    path = _page_path(folder, slug)
+    try:
+        changed = _write(path, render_page(app, url))
+    except Exception:
+        app.logger.exception("prerender: falló %s, se borra la copia estática", url)
+        _remove(path)
+        stats["failed"] += 1
+        return
+    stats["written" if changed else "unchanged"] += 1
+
+
+def refresh(category_ids=None, removed_slugs=()):
+    """Re-renderiza el home y las categorías ``category_ids`` (None = todas).
+
+    ``removed_slugs``: páginas que dejan de existir (categoría borrada o con
+    slug nuevo). No hace nada si PRERENDER está apagado.
+    """
+    app = current_app._get_current_object()
+    if not app.config["PRERENDER"]:
+        return None
+    if category_ids is None:
+        return build_all()
+    folder = app.config["PRERENDER_FOLDER"]
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    for slug in removed_slugs:
+        if slug:
+            _remove(_page_path(folder, slug))
+            stats["removed"] += 1
+    _render_to(app, folder, None, stats)
+    ids = {i for i in category_ids if i}
+    for slug in _slugs(ids) if ids else ():
+        _render_to(app, folder, slug, stats)
+    return stats
+
+
+def build_all():
+    """Todas las páginas; borra las de categorías que ya no existen."""
+    app = current_app._get_current_object()
+    folder = app.config["PRERENDER_FOLDER"]
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    slugs = _slugs()
+    _render_to(app, folder, None, stats)
+    for slug in slugs:
+        _render_to(app, folder, slug, stats)
+    categories_dir = os.path.join(folder, "categoria")
+    if os.path.isdir(categories_dir):
+        for name in set(os.listdir(categories_dir)) - set(slugs):
+            _remove(_page_path(folder, name))
+            stats["removed"] += 1
+    return stats
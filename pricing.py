@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from sqlalchemy import select
+from models import db, Producto
+from catalog_cache import catalog_version
+from cart_utils import cart_items, cart_summary, current_cart_id
+
+# Revalida el carrito contra el catálogo antes de mostrar totales: una sola
+# consulta IN (...) para todas las líneas, aritmética Decimal y el resultado
+# cacheado por carrito. La caché es propia (no la del catálogo, que es para
+# home/búsqueda/categorías y se llenaría de carritos): una entrada por
+# carrito con la última (versión del catálogo, revisión) vista, así un
+# cambio de precios o del carrito la reemplaza en vez de sumar otra.
+
+OK = "ok"
+PRICE_CHANGED = "price_changed"
+INACTIVE = "inactive"
+MISSING = "missing"
+
+PricedCart = namedtuple("PricedCart", ["items", "total", "qty", "issues"])
+EMPTY_PRICED = PricedCart({}, Decimal("0"), 0, 0)
+
+PRICED_CART_CACHE_SIZE = 1024  # carritos activos por proceso
+_priced = OrderedDict()  # cart_id -> (versión del catálogo, revisión, PricedCart)
+_priced_lock = threading.Lock()
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def price_items(items):
+    """Reprecia ``items`` ({pid: {name, price, qty}}) con los precios actuales.
+
+    Cada línea conserva name/price/qty (price pasa a ser el precio vigente) y
+    agrega ``status`` y ``cart_price``. Solo suman al total las líneas
+    comprables (ok o con precio cambiado).
+    """
+    if not items:
+        return EMPTY_PRICED
+    ids = [int(pid) for pid in items]
+    current = {
+        row.id: row
+        for row in db.session.execute(
+            select(Producto.id, Producto.nombre, Producto.precio, Producto.activo).where(
+                Producto.id.in_(ids)
+            )
+        )
+    }
+
+    priced = {}
+    total = Decimal("0")
+    qty_total = 0
+    issues = 0
+    for pid, item in items.items():
+        qty = int(item["qty"])
+        cart_price = _money(item["price"])
+        row = current.get(int(pid))
+        if row is None:
+            status, price = MISSING, cart_price
+        elif not row.activo:
+            status, price = INACTIVE, _money(row.precio)
+        else:
+            price = _money(row.precio)
+            status = OK if price == cart_price else PRICE_CHANGED
+        subtotal = price * qty
+        if status in (OK, PRICE_CHANGED):
+            total += subtotal
+            qty_total += qty
+        if status != OK:
+            issues += 1
+        priced[pid] = {
+            "name": row.nombre if row is not None else item["name"],
+            "price": price,
+            "qty": qty,
+            "subtotal": subtotal,
+            "cart_price": cart_price,
+            "status": status,
+        }
+    return PricedCart(priced, total, qty_total, issues)
+
+
+def priced_cart():
+    """Carrito de la sesión repreciado, cacheado por revisión del carrito."""
+    cart_id = current_cart_id()
+    if not cart_id:
+        return EMPTY_PRICED
+    stamp = (catalog_version(), cart_summary().revision)
+    with _priced_lock:
+        entry = _priced.get(cart_id)
+        if entry is not None and entry[:2] == stamp:
+            _priced.move_to_end(cart_id)
+            return entry[2]
+    priced = price_items(cart_items())
+    with _priced_lock:
+        _priced[cart_id] = (*stamp, priced)
+        _priced.move_to_end(cart_id)
+        while len(_priced) > PRICED_CART_CACHE_SIZE:
+            _priced.popitem(last=False)
+    return priced
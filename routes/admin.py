@@ -1,8 +1,17 @@
-import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort
+import io
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, Response, stream_with_context
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from models import db, Producto, Categoria
+from catalog_cache import bump_catalog_version, catalog_cache
+from catalog_stats import catalog_stats
+from suggest import suggest_index
+import search_index
+from images import enqueue_derivatives, needs_derivatives  # el pool de procesos se importa al primer upload
+from uploads import store_upload
+from catalog import admin_products_query
+import catalog_io
+from metrics import render_metrics
+import prerender
 
 admin_bp = Blueprint("admin", __name__, template_folder="../templates")
 
@@ -10,8 +19,7 @@ admin_bp = Blueprint("admin", __name__, template_folder="../templates")
 def admin_required():
     if not current_user.is_authenticated:
         abort(401)
-    admins = current_app.config.get("ADMIN_EMAILS", {"admin@faigothy.com"})
-    if current_user.email not in admins:
+    if not current_user.is_admin:
         abort(403)
 
 @admin_bp.before_request
@@ -20,6 +28,13 @@ def gate():
     if request.endpoint and request.endpoint.startswith("admin."):
         admin_required()
 
+@admin_bp.errorhandler(413)
+def too_large(e):
+    # MAX_CONTENT_LENGTH: se corta antes de leer el cuerpo
+    limit = current_app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    flash(f"El archivo supera el máximo de {limit} MB.", "danger")
+    return redirect(request.referrer or url_for("admin.products"))
+
 def allowed_file(filename: str) -> bool:
     if not filename or "." not in filename:
         return False
@@ -27,22 +42,91 @@ def allowed_file(filename: str) -> bool:
     allowed = current_app.config.get("ALLOWED_EXTENSIONS") or {"png","jpg","jpeg","gif","webp","avif"}
     return ext in allowed
 
+def form_stock():
+    # Vacío => sin control de stock. Cualquier otra cosa que no sea un entero
+    # >= 0 es ValueError: tomarlo como vacío dejaría el producto sin control
+    # de stock y el checkout lo sobrevendería.
+    raw = request.form.get("stock", "").strip()
+    if not raw:
+        return None
+    stock = int(raw)
+    if stock < 0:
+        raise ValueError(raw)
+    return stock
+
+def save_image(imagen_file):
+    # Guardada por hash de contenido (ver uploads.py): una foto repetida
+    # reutiliza el archivo y sus derivados
+    ext = imagen_file.filename.rsplit(".", 1)[1]
+    filename, existed = store_upload(imagen_file, ext)
+    if not existed or needs_derivatives(current_app.config["UPLOAD_FOLDER"], filename):
+        enqueue_derivatives(filename)
+    return filename
+
+def catalog_changed(product=None, removed_id=None, categories=None, removed_slugs=()):
+    # Llamar después de cada commit que toque productos o categorías.
+    # Con el producto tocado, el índice de sugerencias de este worker se
+    # actualiza sin reconstruir (ver suggest.py). ``categories``: ids cuyas
+    # páginas estáticas hay que regenerar además del home (None = todas,
+    # ver prerender.py); la del producto se agrega sola. Toda página de
+    # categoría muestra los conteos de las demás: si cambian (alta, baja,
+    # activo, categoría) hay que pasar None.
+    version = bump_catalog_version()
+    if product is not None:
+        suggest_index.update_product(product.id, product.nombre, product.activo, version)
+    elif removed_id is not None:
+        suggest_index.remove_product(removed_id, version)
+    if categories is not None and product is not None:
+        categories = {*categories, product.categoria_id}
+    prerender.refresh(categories, removed_slugs)
+
 # ----------------- Dashboard -----------------
 @admin_bp.route("/", endpoint="dashboard")
 @login_required
 def dashboard():
-    prod_count = db.session.query(Producto).count()
-    cat_count = db.session.query(Categoria).count()
-    return render_template("admin/dashboard.html", prod_count=prod_count, cat_count=cat_count)
+    # Una fila por categoría, mantenida al escribir (ver catalog_stats.py)
+    return render_template(
+        "admin/dashboard.html",
+        stats=catalog_stats(),
+        cache_stats=catalog_cache.stats(),
+    )
+
+# Métricas de este proceso en formato de texto de Prometheus
+@admin_bp.route("/metrics", endpoint="metrics")
+@login_required
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 # ----------------- Productos -----------------
 # Listado (endpoint: admin.products)
 @admin_bp.route("/product", endpoint="products")
 @login_required
 def product_list():
-    productos = Producto.query.order_by(Producto.id.desc()).all()
-    cats = {c.id: c for c in Categoria.query.all()}
-    return render_template("admin/product_list.html", productos=productos, cats=cats)
+    # Paginación keyset por id (desc) y solo las columnas de la tabla: la
+    # memoria y la latencia no dependen del tamaño del catálogo.
+    page_size = current_app.config["ADMIN_PAGE_SIZE"]
+    after = request.args.get("after", type=int)
+    filtros = {
+        "categoria": request.args.get("categoria", type=int),
+        "activo": request.args.get("activo", ""),
+        "q": request.args.get("q", "").strip(),
+    }
+
+    productos = admin_products_query(after=after, **filtros).limit(page_size + 1).all()
+    next_after = None
+    if len(productos) > page_size:
+        productos = productos[:page_size]
+        next_after = productos[-1].id
+
+    categorias = db.session.query(Categoria.id, Categoria.nombre).order_by(Categoria.nombre).all()
+    return render_template(
+        "admin/product_list.html",
+        productos=productos,
+        categorias=categorias,
+        filtros=filtros,
+        next_after=next_after,
+        is_first_page=not after,
+    )
 
 # Nuevo (endpoint: admin.product_new)
 @admin_bp.route("/product/new", methods=["GET", "POST"], endpoint="product_new")
@@ -55,6 +139,11 @@ def product_new():
         precio = request.form.get("precio", "0").strip()
         categoria_id = int(request.form.get("categoria_id", "0") or 0)
         activo = bool(request.form.get("activo"))
+        try:
+            stock = form_stock()
+        except ValueError:
+            flash("Stock inválido: un número entero desde 0 (vacío = sin control de stock).", "danger")
+            return render_template("admin/product_form.html", categorias=categorias, product=None, form=request.form)
         imagen_file = request.files.get("imagen")
 
         filename = ""
@@ -62,17 +151,7 @@ def product_new():
             if not allowed_file(imagen_file.filename):
                 flash("Formato de imagen no permitido.", "danger")
                 return render_template("admin/product_form.html", categorias=categorias, product=None, form=request.form)
-            filename = secure_filename(imagen_file.filename)
-            save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            # Evitar sobrescribir
-            base, ext = os.path.splitext(filename)
-            i = 1
-            while os.path.exists(save_path):
-                filename = f"{base}-{i}{ext}"
-                save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-                i += 1
-            imagen_file.save(save_path)
+            filename = save_image(imagen_file)
 
         p = Producto(
             nombre=nombre,
@@ -81,9 +160,13 @@ def product_new():
             precio=precio,
             categoria_id=categoria_id,
             activo=activo,
+            stock=stock,
         )
         db.session.add(p)
+        db.session.flush()
+        search_index.index_product(p)
         db.session.commit()
+        catalog_changed(product=p, categories=None if p.activo else ())
         flash("Producto creado.", "success")
         return redirect(url_for("admin.products"))
     return render_template("admin/product_form.html", categorias=categorias, product=None)
@@ -95,30 +178,31 @@ def product_edit(product_id):
     p = Producto.query.get_or_404(product_id)
     categorias = Categoria.query.order_by(Categoria.nombre).all()
     if request.method == "POST":
+        try:
+            stock = form_stock()
+        except ValueError:
+            flash("Stock inválido: un número entero desde 0 (vacío = sin control de stock).", "danger")
+            return render_template("admin/product_form.html", categorias=categorias, product=p, p=p)
+        old_categoria_id, old_activo = p.categoria_id, p.activo
         p.nombre = request.form.get("nombre", "").strip()
         p.descripcion = request.form.get("descripcion", "").strip()
         p.precio = request.form.get("precio", "0").strip()
         p.categoria_id = int(request.form.get("categoria_id", "0") or 0)
         p.activo = bool(request.form.get("activo"))
+        p.stock = stock
 
         imagen_file = request.files.get("imagen")
         if imagen_file and imagen_file.filename:
             if not allowed_file(imagen_file.filename):
                 flash("Formato de imagen no permitido.", "danger")
                 return render_template("admin/product_form.html", categorias=categorias, product=p, p=p)
-            filename = secure_filename(imagen_file.filename)
-            save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            base, ext = os.path.splitext(filename)
-            i = 1
-            while os.path.exists(save_path):
-                filename = f"{base}-{i}{ext}"
-                save_path = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
-                i += 1
-            imagen_file.save(save_path)
+            filename = save_image(imagen_file)
             p.imagen = filename  # actualiza referencia
 
+        search_index.index_product(p)
         db.session.commit()
+        counts_changed = (old_categoria_id, old_activo) != (p.categoria_id, p.activo)
+        catalog_changed(product=p, categories=None if counts_changed else (old_categoria_id,))
         flash("Producto actualizado.", "success")
         return redirect(url_for("admin.products"))
     return render_template("admin/product_form.html", categorias=categorias, product=p, p=p)
@@ -128,11 +212,49 @@ def product_edit(product_id):
 @login_required
 def product_delete(product_id):
     p = Producto.query.get_or_404(product_id)
+    categoria_id, activo = p.categoria_id, p.activo
+    search_index.remove_product(p.id)
     db.session.delete(p)
     db.session.commit()
+    catalog_changed(removed_id=product_id, categories=None if activo else (categoria_id,))
     flash("Producto eliminado.", "success")
     return redirect(url_for("admin.products"))
 
+# Exportar (streaming, sin materializar la tabla)
+@admin_bp.route("/product/export", endpoint="product_export")
+@login_required
+def product_export():
+    fmt = request.args.get("format", "csv")
+    if fmt not in catalog_io.FORMATS:
+        abort(400)
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(catalog_io.export_rows(fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=catalogo.{fmt}"},
+    )
+
+# Importar CSV/JSONL (upsert por lotes)
+@admin_bp.route("/product/import", methods=["POST"], endpoint="product_import")
+@login_required
+def product_import():
+    archivo = request.files.get("archivo")
+    if not archivo or not archivo.filename:
+        flash("Elegí un archivo CSV o JSONL.", "danger")
+        return redirect(url_for("admin.products"))
+    fmt = "jsonl" if archivo.filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    # utf-8-sig: un CSV guardado con Excel empieza con BOM y si no el
+    # header "nombre" no coincide
+    stream = io.TextIOWrapper(archivo.stream, encoding="utf-8-sig", newline="")
+    result = catalog_io.import_rows(catalog_io.read_rows(stream, fmt))
+    flash(
+        f"Importación: {result.inserted} nuevos, {result.updated} actualizados, {len(result.errors)} errores.",
+        "danger" if result.errors else "success",
+    )
+    for line_num, message in result.errors[:10]:
+        flash(f"Línea {line_num}: {message}", "danger")
+    return redirect(url_for("admin.products"))
+
 # ----------------- Categorías -----------------
 # Listado (endpoint: admin.categories)
 @admin_bp.route("/category", endpoint="categories")
@@ -154,8 +276,10 @@ def category_new():
         if Categoria.query.filter_by(slug=slug).first():
             flash("Ese slug ya existe.", "danger")
             return render_template("admin/category_form.html", form=request.form)
-        db.session.add(Categoria(nombre=nombre, slug=slug))
+        c = Categoria(nombre=nombre, slug=slug)
+        db.session.add(c)
         db.session.commit()
+        catalog_changed()  # aparece en los filtros de todas las categorías
         flash("Categoría creada.", "success")
         return redirect(url_for("admin.categories"))
     return render_template("admin/category_form.html")
@@ -166,9 +290,11 @@ def category_new():
 def category_edit(category_id):
     c = Categoria.query.get_or_404(category_id)
     if request.method == "POST":
+        old_slug = c.slug
         c.nombre = request.form.get("nombre", "").strip()
         c.slug = request.form.get("slug", "").strip()
         db.session.commit()
+        catalog_changed(removed_slugs=(old_slug,) if old_slug != c.slug else ())
         flash("Categoría actualizada.", "success")
         return redirect(url_for("admin.categories"))
     return render_template("admin/category_form.html", c=c)
@@ -178,7 +304,9 @@ def category_edit(category_id):
 @login_required
 def category_delete(category_id):
     c = Categoria.query.get_or_404(category_id)
+    slug = c.slug
     db.session.delete(c)
     db.session.commit()
+    catalog_changed(removed_slugs=(slug,))
     flash("Categoría eliminada.", "success")
     return redirect(url_for("admin.categories"))
\ No newline at end of file
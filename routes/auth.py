@@ -1,17 +1,33 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
 from models import db, User
+from passwords import HashingBusy, rehash_if_needed
+from identity import identity_for
 
 auth_bp = Blueprint("auth", __name__, template_folder="../templates")
 
+BUSY_MESSAGE = "Hay muchos ingresos en este momento, probá de nuevo en unos segundos."
+RETRY_AFTER = "2"
+
+def _busy(template, **context):
+    # 429 rápido cuando el pool de hashing está lleno (ver passwords.py)
+    return render_template(template, **context), 429, {"Retry-After": RETRY_AFTER}
+
 @auth_bp.route("/login", methods=["GET", "POST"], endpoint="login")
 def login():
     if request.method == "POST":
         email = request.form.get("email","").strip().lower()
         password = request.form.get("password","")
         user = User.query.filter_by(email=email).first()
-        if user and user.check_password(password):
-            login_user(user)
+        try:
+            ok = bool(user) and user.check_password(password)
+        except HashingBusy:
+            flash(BUSY_MESSAGE, "danger")
+            return _busy("login.html")
+        if ok:
+            if rehash_if_needed(user, password):
+                db.session.commit()
+            login_user(identity_for(user))
             flash("¡Bienvenido/a!", "success")
             return redirect(url_for("index"))
         flash("Email o contraseña inválidos", "danger")
@@ -30,10 +46,13 @@ def register():
         if User.query.filter_by(email=email).first():
             return render_template("register.html", error="Ese email ya está registrado.")
         user = User(nombre=nombre, email=email)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except HashingBusy:
+            return _busy("register.html", error=BUSY_MESSAGE)
         db.session.add(user)
         db.session.commit()
-        login_user(user)
+        login_user(identity_for(user))
         return redirect(url_for("index"))
     return render_template("register.html")
 
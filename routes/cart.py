@@ -1,51 +1,116 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify
-from models import Producto
-from cart_utils import add_to_cart, cart_items, update_quantity, remove_from_cart, cart_total, clear_cart, cart_qty
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, abort
+from catalog import product_snapshot
+from catalog_cache import catalog_version
+from pricing import priced_cart
+from cart_utils import add_to_cart, update_quantity, remove_from_cart, clear_cart, cart_qty, cart_summary
 
 cart_bp = Blueprint("cart", __name__, template_folder="../templates")
 
+# ----------------- Estado para el frontend -----------------
+# app.js sincroniza el panel con una sola llamada: /carrito/state devuelve
+# qty, total y las líneas ya renderizadas, y cada mutación (con
+# X-Requested-With: fetch) devuelve lo mismo pero solo con las líneas que
+# cambiaron, si el cliente manda en X-Cart-Revision la revisión previa (si
+# no, el estado completo). "revision" cambia con el carrito y con el
+# catálogo (precios). "qty" es la del badge (todas las líneas, igual que
+# /carrito/qty); "qty_available" cuenta solo las líneas que entran en
+# "total" (sin productos inactivos o borrados, ver "issues").
+
+def revision_token(cart_revision, version):
+    return f"{cart_revision}.{version}"
+
+def cart_revision():
+    return revision_token(cart_summary().revision, catalog_version())
+
+def _line(pid, priced):
+    item = priced.items.get(pid)
+    if item is None:
+        return {"id": pid, "removed": True}
+    return {"id": pid, "html": render_template("partials/cart_line.html", pid=pid, item=item)}
+
+def cart_state(changed=None):
+    """Estado del carrito; ``changed`` = ids tocados (None => todas las líneas)."""
+    priced = priced_cart()
+    return {
+        "ok": True,
+        "revision": cart_revision(),
+        "qty": cart_qty(),
+        "qty_available": priced.qty,
+        "total": str(priced.total),
+        "total_display": "₲ %.0f" % priced.total,
+        "issues": priced.issues,
+        "full": changed is None,
+        "lines": [_line(pid, priced) for pid in (priced.items if changed is None else changed)],
+    }
+
+def _wants_json():
+    return request.headers.get("X-Requested-With") == "fetch"
+
+def _mutation_response(changed, prev_revision):
+    if request.headers.get("X-Cart-Revision") != prev_revision:
+        changed = None
+    return jsonify(cart_state(changed))
+
+# ----------------- Vistas -----------------
 @cart_bp.route("/", methods=["GET"], endpoint="index")
 def index():
-    items = cart_items()
-    total = cart_total()
-    return render_template("carrito.html", items=items, total=total)
+    priced = priced_cart()
+    return render_template("carrito.html", items=priced.items, total=priced.total, issues=priced.issues)
 
 @cart_bp.route("/panel", methods=["GET"], endpoint="panel")
 def panel():
-    items = cart_items()
-    total = cart_total()
-    return render_template("partials/cart_panel.html", items=items, total=total)
+    priced = priced_cart()
+    return render_template(
+        "partials/cart_panel.html",
+        items=priced.items,
+        total=priced.total,
+        issues=priced.issues,
+        revision=cart_revision(),
+    )
 
 @cart_bp.route("/qty", methods=["GET"], endpoint="qty")
 def qty():
     return jsonify({"qty": cart_qty()})
 
+@cart_bp.route("/state", methods=["GET"], endpoint="state")
+def state():
+    # ?since=<revision>: si no cambió nada no se reprecia ni se renderiza
+    revision = cart_revision()
+    if request.args.get("since") == revision:
+        return jsonify({"ok": True, "unchanged": True, "revision": revision, "qty": cart_qty()})
+    return jsonify(cart_state())
+
 @cart_bp.route("/add/<int:product_id>", methods=["POST"], endpoint="add")
 def add(product_id):
-    prod = Producto.query.get_or_404(product_id)
+    prod = product_snapshot(product_id)
+    if prod is None:
+        abort(404)
+    prev = cart_revision() if _wants_json() else None
     add_to_cart(prod.id, prod.nombre, float(prod.precio), qty=int(request.form.get("qty", 1)))
-    if request.headers.get("X-Requested-With") == "fetch":
-        return jsonify({"ok": True, "qty": cart_qty()})
+    if _wants_json():
+        return _mutation_response([str(prod.id)], prev)
     return redirect(request.referrer or url_for("index"))
 
 @cart_bp.route("/update/<int:product_id>", methods=["POST"], endpoint="update")
 def update(product_id):
     qty = int(request.form.get("qty", 1))
+    prev = cart_revision() if _wants_json() else None
     update_quantity(product_id, qty)
-    if request.headers.get("X-Requested-With") == "fetch":
-        return jsonify({"ok": True, "qty": cart_qty()})
+    if _wants_json():
+        return _mutation_response([str(product_id)], prev)
     return redirect(url_for("cart.index"))
 
 @cart_bp.route("/remove/<int:product_id>", methods=["POST"], endpoint="remove")
 def remove(product_id):
+    prev = cart_revision() if _wants_json() else None
     remove_from_cart(product_id)
-    if request.headers.get("X-Requested-With") == "fetch":
-        return jsonify({"ok": True, "qty": cart_qty()})
+    if _wants_json():
+        return _mutation_response([str(product_id)], prev)
     return redirect(url_for("cart.index"))
 
 @cart_bp.route("/clear", methods=["POST"], endpoint="clear")
 def clear():
     clear_cart()
-    if request.headers.get("X-Requested-With") == "fetch":
-        return jsonify({"ok": True, "qty": cart_qty()})
+    if _wants_json():
+        return jsonify(cart_state())
     return redirect(url_for("cart.index"))
@@ -0,0 +1,46 @@
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask_login import login_required, current_user
+from models import db, Order
+from pricing import priced_cart
+from cart_utils import clear_cart
+from orders import CheckoutError, place_order
+
+orders_bp = Blueprint("orders", __name__, template_folder="../templates")
+
+# Confirmar el checkout (ver orders.py). El form trae la clave de
+# idempotencia que se generó al renderizar el checkout y el total que vio el
+# comprador; los clientes por API pueden mandar el header Idempotency-Key.
+
+@orders_bp.route("/", methods=["POST"], endpoint="create")
+@login_required
+def create():
+    key = (request.headers.get("Idempotency-Key") or request.form.get("idempotency_key", "")).strip()
+    if not key or len(key) > 64:
+        abort(400)
+    expected_total = request.form.get("expected_total")
+    if expected_total is not None:
+        # Campo del form: si no es un monto (adulterado, NaN, 1e999...) es 400
+        try:
+            expected_total = Decimal(expected_total.strip()).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            abort(400)
+        if expected_total.is_nan():
+            abort(400)
+    try:
+        order, created = place_order(current_user.id, key, priced_cart().items, expected_total)
+    except CheckoutError as exc:
+        flash(str(exc), "danger")
+        return redirect(url_for("checkout"))
+    if created:
+        clear_cart()
+        flash("¡Gracias por tu compra!", "success")
+    return redirect(url_for("orders.detail", order_id=order.id), code=303)
+
+@orders_bp.route("/<int:order_id>", methods=["GET"], endpoint="detail")
+@login_required
+def detail(order_id):
+    order = db.session.get(Order, order_id)
+    if order is None or order.user_id != current_user.id:
+        abort(404)
+    return render_template("order.html", order=order)
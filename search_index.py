@@ -0,0 +1,155 @@
+import base64
+import re
+import unicodedata
+from sqlalchemy import text
+from models import db, Producto
+
+# Índice de búsqueda sobre productos activos (SQLite FTS5).
+# El rowid de la tabla virtual es el id del producto; el texto se guarda ya
+# normalizado (sin acentos, casefold) para que "corazon" encuentre "Corazón".
+
+FTS_TABLE = "productos_fts"
+# Peso de cada columna en bm25(): el nombre pesa más que la descripción.
+NOMBRE_WEIGHT = 10.0
+DESCRIPCION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_ready_engines = set()
+
+
+def normalize(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return value.casefold()
+
+
+def _match_expression(query: str) -> str:
+    # Cada palabra como prefijo ("aro" encuentra "aros"), todas obligatorias
+    tokens = _TOKEN_RE.findall(normalize(query))
+    return " ".join(f'"{tok}"*' for tok in tokens)
+
+
+def _create_table():
+    db.session.execute(
+        text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(nombre, descripcion, tokenize='unicode61 remove_diacritics 2')"
+        )
+    )
+
+
+def ensure_index():
+    """Crea la tabla FTS si falta y la llena la primera vez (una vez por engine)."""
+    key = str(db.engine.url)
+    if key in _ready_engines:
+        return
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).first()
+    if not exists:
+        rebuild()
+    _ready_engines.add(key)
+
+
+def rebuild():
+    _create_table()
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    rows = db.session.execute(
+        db.select(Producto.id, Producto.nombre, Producto.descripcion).where(
+            Producto.activo == True
+        )
+    )
+    params = [
+        {"id": pid, "nombre": normalize(nombre), "descripcion": normalize(descripcion)}
+        for pid, nombre, descripcion in rows
+    ]
+    if params:
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, nombre, descripcion) VALUES (:id, :nombre, :descripcion)"),
+            params,
+        )
+    db.session.commit()
+
+
+def index_product(p: Producto):
+    """Sincroniza un producto; llamar antes del commit que lo guarda."""
+    ensure_index()
+    remove_product(p.id)
+    if p.activo:
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, nombre, descripcion) VALUES (:id, :nombre, :descripcion)"),
+            {"id": p.id, "nombre": normalize(p.nombre), "descripcion": normalize(p.descripcion)},
+        )
+
+
+def remove_product(product_id: int):
+    ensure_index()
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": product_id})
+
+
+# ----------------- Cursor -----------------
+def encode_cursor(score: float, product_id: int) -> str:
+    raw = f"{score!r}:{product_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, product_id = raw.split(":", 1)
+        return float(score), int(product_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# ----------------- Búsqueda -----------------
+def search(query: str, limit: int = 24, cursor: str = None):
+    """Productos activos que coinciden con ``query``, ordenados por bm25.
+
+    Devuelve ``(productos, next_cursor)``; ``next_cursor`` es None en la
+    última página.
+    """
+    match = _match_expression(query)
+    if not match:
+        return [], None
+    ensure_index()
+
+    params = {"match": match, "limit": limit + 1}
+    after = ""
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        after = "WHERE score > :score OR (score = :score AND pid > :pid)"
+        params["score"], params["pid"] = position
+
+    rows = db.session.execute(
+        text(
+            "SELECT pid, score FROM ("
+            f"  SELECT rowid AS pid, bm25({FTS_TABLE}, {NOMBRE_WEIGHT}, {DESCRIPCION_WEIGHT}) AS score"
+            f"  FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+            f") {after} ORDER BY score, pid LIMIT :limit"
+        ),
+        params,
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].score, rows[-1].pid)
+
+    ids = [r.pid for r in rows]
+    if not ids:
+        return [], next_cursor
+    by_id = {
+        p.id: p
+        for p in Producto.query.filter(Producto.id.in_(ids), Producto.activo == True).all()
+    }
+    return [by_id[pid] for pid in ids if pid in by_id], next_cursor
+
+
+def ilike_search(query: str):
+    # Búsqueda anterior (scan completo); se conserva como referencia del benchmark
+    return Producto.query.filter(
+        Producto.activo == True,
+        (Producto.nombre.ilike(f"%{query}%")) | (Producto.descripcion.ilike(f"%{query}%")),
+    ).all()
@@ -0,0 +1,81 @@
+import logging
+import os
+import time
+from flask import g
+from jinja2 import FileSystemBytecodeCache
+
+# Arranque en frío de cada worker: create_app() importa todo y Jinja compila
+# cada template la primera vez que se usa, así que el primer request después
+# de un deploy (o de que el autoscaler sume workers) paga la compilación de
+# layouts.html, index.html, etc.
+#
+# - Caché de bytecode de Jinja en disco (instance/jinja_cache): la comparten
+#   todos los workers y sobrevive reinicios; Jinja la invalida sola cuando
+#   cambia el fuente del template.
+# - Warm-up opcional: create_app() carga todos los templates antes de
+#   atender, con la caché de bytecode eso es leer archivos.
+# - Reporte de arranque: imports, create_app, warm-up y el primer request,
+#   en el log, en app.extensions["startup"] y en /admin/metrics.
+
+log = logging.getLogger(__name__)
+
+# app.py importa este módulo antes que todo lo demás
+IMPORT_STARTED = time.perf_counter()
+
+TEMPLATE_SUFFIXES = (".html",)
+
+
+def init_template_cache(app):
+    app.config.setdefault("JINJA_BYTECODE_CACHE", True)
+    app.config.setdefault("JINJA_BYTECODE_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache"))
+    app.config.setdefault("TEMPLATE_WARMUP", True)
+    if not app.config["JINJA_BYTECODE_CACHE"]:
+        return
+    directory = app.config["JINJA_BYTECODE_CACHE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory, "faigothy-%s.cache")
+
+
+def warm_templates(app):
+    """Compila (o carga del bytecode) todos los templates; devuelve cuántos."""
+    names = [n for n in app.jinja_env.list_templates() if n.endswith(TEMPLATE_SUFFIXES)]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def _first_request(report):
+    def start():
+        if "first_request" not in report:
+            g._startup_t0 = time.perf_counter()
+
+    def finish(exc):
+        started = g.pop("_startup_t0", None)
+        if started is not None and "first_request" not in report:
+            report.setdefault("first_request", time.perf_counter() - started)
+            log.info("Primer request: %.0fms", report["first_request"] * 1000)
+
+    return start, finish
+
+
+def finish_startup(app, init_started):
+    """Último paso de create_app(): warm-up y reporte de tiempos."""
+    # "import" solo tiene sentido para el primer create_app() del proceso
+    report = {"import": init_started - IMPORT_STARTED, "warmup": 0.0, "templates": 0}
+    if app.config["TEMPLATE_WARMUP"]:
+        t0 = time.perf_counter()
+        report["templates"] = warm_templates(app)
+        report["warmup"] = time.perf_counter() - t0
+    report["init"] = time.perf_counter() - init_started
+    app.extensions["startup"] = report
+
+    start, finish = _first_request(report)
+    app.before_request(start)
+    app.teardown_request(finish)
+    log.info(
+        "Arranque: imports %.0fms, create_app %.0fms (warm-up de %d templates %.0fms)",
+        report["import"] * 1000,
+        report["init"] * 1000,
+        report["templates"],
+        report["warmup"] * 1000,
+    )
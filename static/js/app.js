@@ -1,7 +1,7 @@
 document.addEventListener('DOMContentLoaded', () => {
   const overlay = document.getElementById('overlay');
   const sideMenu = document.getElementById('side-menu');
-  let cartPanel = document.getElementById('cart-panel');
+  const cartPanel = document.getElementById('cart-panel');
   const cartCountEl = document.getElementById('cart-count');
   const loginModal = document.getElementById('login-modal');
   const loginModalBody = document.getElementById('login-modal-body');
@@ -149,62 +149,180 @@ document.addEventListener('DOMContentLoaded', () => {
     unlockScroll();
   }
 
-  // Mantiene el panel ABIERTO y preserva el scroll al refrescar
-  async function refreshCartPanel() {
-    const html = await (await safeFetch('/carrito/panel')).text();
-
-    const wasOpen = cartPanel?.classList.contains('open');
-    const prevScroll = cartPanel?.querySelector('#cart-list')?.scrollTop ?? 0;
-
-    const temp = document.createElement('div');
-    temp.innerHTML = html;
-    const newPanel = temp.querySelector('#cart-panel');
-
-    if (newPanel && cartPanel) {
-      cartPanel.replaceWith(newPanel);
-      cartPanel = newPanel;
+  // ===== Estado del carrito =====
+  // Una sola llamada por acción: las mutaciones devuelven qty, total y las
+  // líneas que cambiaron (HTML ya renderizado); el panel se parchea en el
+  // lugar. Si el servidor ve que nuestra revisión no es la previa, manda el
+  // estado completo.
+  let cartRevision = cartPanel?.dataset.revision || null;
+
+  function setBadge(qty) {
+    if (!cartCountEl) return;
+    cartCountEl.textContent = qty;
+    cartCountEl.classList.toggle('hidden', qty <= 0);
+    if (qty > 0) {
+      cartCountEl.classList.add('scale-110');            // animación
+      setTimeout(() => cartCountEl.classList.remove('scale-110'), 150);
+    }
+  }
 
-      if (wasOpen) {
-        cartPanel.classList.add('open');
-        cartPanel.setAttribute('aria-hidden', 'false');
-        const list = cartPanel.querySelector('#cart-list');
-        if (list) list.scrollTop = prevScroll;
+  function applyCartState(data) {
+    const qty = data?.qty ?? 0;
+    setBadge(qty);
+    if (!data || data.unchanged || !cartPanel) return qty;
+
+    const list = cartPanel.querySelector('#cart-list');
+    const empty = list?.querySelector('#cart-empty');
+    if (list) {
+      if (data.full) list.querySelectorAll('[data-cart-line]').forEach((el) => el.remove());
+      for (const line of data.lines || []) {
+        const current = list.querySelector(`[data-cart-line="${line.id}"]`);
+        if (line.removed) { current?.remove(); continue; }
+        const tpl = document.createElement('template');
+        tpl.innerHTML = line.html.trim();
+        const el = tpl.content.firstElementChild;
+        if (current) current.replaceWith(el);
+        else list.insertBefore(el, empty || null);
       }
+      empty?.classList.toggle('hidden', !!list.querySelector('[data-cart-line]'));
     }
+    const totalEl = cartPanel.querySelector('#cart-total');
+    if (totalEl) totalEl.textContent = data.total_display;
+    cartRevision = data.revision;
+    cartPanel.dataset.revision = data.revision;
+    return qty;
+  }
+
+  // Al abrir el panel: si la revisión no cambió no se re-renderiza nada
+  async function syncCart() {
+    const url = cartRevision ? `/carrito/state?since=${encodeURIComponent(cartRevision)}` : '/carrito/state';
+    return applyCartState(await (await safeFetch(url)).json());
   }
 
-  // devuelve el número actualizado y anima el badge
-  async function refreshCartBadge() {
+  // POST de una acción del carrito; devuelve la cantidad nueva
+  async function cartAction(url, body) {
+    const headers = { 'X-Requested-With': 'fetch' };
+    if (cartRevision) headers['X-Cart-Revision'] = cartRevision;
+    const res = await safeFetch(url, { method: 'POST', body, headers });
+    return applyCartState(await res.json());
+  }
+
+  // ===== Páginas pre-renderizadas (ver prerender.py) =====
+  // El HTML estático es el de un anónimo sin carrito: una llamada completa
+  // el badge, los botones de sesión y los mensajes flash pendientes.
+  async function hydrate(url) {
+    let data;
     try {
-      const res = await safeFetch('/carrito/qty');
-      let qty;
+      data = await (await safeFetch(url, {}, { errorToast: false })).json();
+    } catch (err) {
+      return;
+    }
+    if (cartCountEl) {
+      cartCountEl.textContent = data.qty;
+      cartCountEl.classList.toggle('hidden', data.qty <= 0);
+    }
+    document.querySelectorAll('[data-auth]').forEach((el) => {
+      const role = el.dataset.auth;
+      const show = role === 'anon' ? !data.user : role === 'admin' ? data.admin : data.user;
+      el.classList.toggle('hidden', !show);
+    });
+    const types = { success: 'success', danger: 'error' };
+    for (const [category, message] of data.flashes || []) {
+      const text = document.createElement('span');
+      text.textContent = message;  // showToast arma innerHTML
+      showToast({ type: types[category] || 'info', message: text.innerHTML, timeout: 5000 });
+    }
+  }
 
-      const ct = (res.headers.get('content-type') || '').toLowerCase();
-      if (ct.includes('application/json')) {
-        const data = await res.json();
-        qty = (typeof data === 'number') ? data : (data.qty ?? 0);
-      } else {
-        const txt = await res.text();
-        qty = parseInt(txt, 10);
-        if (Number.isNaN(qty)) {
-          try { qty = JSON.parse(txt).qty ?? 0; } catch { qty = 0; }
+  if ($body.dataset.hydrate) hydrate($body.dataset.hydrate);
+
+  // ===== Sugerencias del buscador =====
+  // Espera a que se deje de tipear (debounce) y cancela el pedido anterior
+  // con AbortController: solo se muestra la respuesta de lo último escrito.
+  const SUGGEST_DELAY = 120;
+
+  function setupSuggest(input) {
+    const list = document.createElement('ul');
+    list.setAttribute('role', 'listbox');
+    list.className = 'absolute left-0 right-0 top-full mt-1 z-50 hidden rounded-xl border border-gray-200 bg-white shadow-lg text-left text-sm overflow-hidden';
+    input.closest('form').appendChild(list);
+    input.setAttribute('aria-autocomplete', 'list');
+
+    const cache = new Map();
+    let timer = null;
+    let controller = null;
+    let active = -1;
+
+    const items = () => [...list.querySelectorAll('a')];
+    const hide = () => { list.classList.add('hidden'); list.replaceChildren(); active = -1; };
+
+    function render(data) {
+      list.replaceChildren();
+      active = -1;
+      const groups = [['Categorías', data.categorias], ['Productos', data.productos]];
+      for (const [label, entries] of groups) {
+        if (!entries?.length) continue;
+        const head = document.createElement('li');
+        head.className = 'px-3 pt-2 pb-1 text-xs uppercase tracking-wide opacity-60';
+        head.textContent = label;
+        list.appendChild(head);
+        for (const entry of entries) {
+          const li = document.createElement('li');
+          const a = document.createElement('a');
+          a.href = entry.url;
+          a.setAttribute('role', 'option');
+          a.className = 'block px-3 py-2 hover:bg-gray-100';
+          a.textContent = entry.nombre;
+          li.appendChild(a);
+          list.appendChild(li);
         }
       }
+      list.classList.toggle('hidden', !list.children.length);
+    }
 
-      if (cartCountEl) {
-        cartCountEl.textContent = qty;
-        cartCountEl.classList.toggle('hidden', qty <= 0);
-        if (qty > 0) {
-          cartCountEl.classList.add('scale-110');            // animación
-          setTimeout(() => cartCountEl.classList.remove('scale-110'), 150);
-        }
+    async function fetchSuggestions(q) {
+      if (cache.has(q)) return render(cache.get(q));
+      controller?.abort();
+      controller = new AbortController();
+      try {
+        const res = await fetch(`${input.dataset.suggest}?q=${encodeURIComponent(q)}`, { signal: controller.signal });
+        if (!res.ok) return;
+        const data = await res.json();
+        cache.set(q, data);
+        if (input.value.trim() === q) render(data);
+      } catch (err) {
+        if (err.name !== 'AbortError') console.error('Suggest error:', err);
       }
-      return qty;
-    } catch (_) {
-      return 0;
     }
+
+    input.addEventListener('input', () => {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) { controller?.abort(); hide(); return; }
+      timer = setTimeout(() => fetchSuggestions(q), SUGGEST_DELAY);
+    });
+
+    input.addEventListener('keydown', (e) => {
+      const options = items();
+      if (!options.length) return;
+      if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+        e.preventDefault();
+        active = (active + (e.key === 'ArrowDown' ? 1 : -1) + options.length) % options.length;
+        options.forEach((a, i) => a.classList.toggle('bg-gray-100', i === active));
+      } else if (e.key === 'Enter' && active >= 0) {
+        e.preventDefault();
+        window.location.href = options[active].href;
+      } else if (e.key === 'Escape') {
+        hide();
+      }
+    });
+
+    // mousedown en una opción ocurre antes del blur
+    input.addEventListener('blur', () => setTimeout(hide, 150));
   }
 
+  document.querySelectorAll('input[data-suggest]').forEach(setupSuggest);
+
   // ===== Scroll suave a secciones (hash links) =====
   function smoothScrollToHash(hash) {
     if (!hash || hash === '#') return;
@@ -238,7 +356,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // Carrito
     if (t.id === 'open-cart') {
       e.preventDefault();
-      await refreshCartPanel();
+      await syncCart();
       openCart();
       return;
     }
@@ -249,9 +367,7 @@ document.addEventListener('DOMContentLoaded', () => {
       e.preventDefault();
       const form = document.getElementById('clear-cart-form');
       if (form) {
-        await safeFetch(form.action || '/carrito/clear', { method: 'POST' });
-        await refreshCartPanel();
-        const qty = await refreshCartBadge();
+        const qty = await cartAction(form.action || '/carrito/clear');
         showToast({ type: 'info', title: 'Carrito', message: 'Se vació el carrito.' });
         if (qty === 0) closeCart();
       }
@@ -263,9 +379,7 @@ document.addEventListener('DOMContentLoaded', () => {
       e.preventDefault();
       const form = t.closest('form'); // .cart-qty-form
       if (!form) return;
-      await safeFetch(form.action, { method: 'POST', body: new FormData(form) });
-      await refreshCartPanel();
-      const qty = await refreshCartBadge();
+      const qty = await cartAction(form.action, new FormData(form));
       showToast({ type: 'success', title: 'Cantidad actualizada' });
       if (qty === 0) closeCart();
       return;
@@ -276,9 +390,7 @@ document.addEventListener('DOMContentLoaded', () => {
       e.preventDefault();
       const form = t.closest('form'); // .cart-remove-form
       if (!form) return;
-      await safeFetch(form.action, { method: 'POST' });
-      await refreshCartPanel();
-      const qty = await refreshCartBadge();
+      const qty = await cartAction(form.action);
       showToast({ type: 'info', title: 'Producto eliminado' });
       if (qty === 0) closeCart();
       return;
@@ -324,22 +436,16 @@ document.addEventListener('DOMContentLoaded', () => {
     e.preventDefault();
 
     if (qtyForm) {
-      await safeFetch(qtyForm.action, { method: 'POST', body: new FormData(qtyForm) });
-      await refreshCartPanel();
-      await refreshCartBadge();
+      await cartAction(qtyForm.action, new FormData(qtyForm));
       return;
     }
     if (rmForm) {
-      await safeFetch(rmForm.action, { method: 'POST' });
-      await refreshCartPanel();
-      await refreshCartBadge();
+      await cartAction(rmForm.action);
       showToast({ type: 'info', title: 'Producto eliminado' });
       return;
     }
     if (clrForm) {
-      await safeFetch(clrForm.action, { method: 'POST' });
-      await refreshCartPanel();
-      await refreshCartBadge();
+      await cartAction(clrForm.action);
       showToast({ type: 'info', title: 'Carrito', message: 'Se vació el carrito.' });
       return;
     }
@@ -361,12 +467,7 @@ document.addEventListener('DOMContentLoaded', () => {
     if (submitBtn) { submitBtn.disabled = true; submitBtn.style.opacity = '0.7'; }
 
     try {
-      await safeFetch(form.action, {
-        method: 'POST',
-        body: new FormData(form),
-        headers: { 'X-Requested-With': 'fetch' }
-      });
-      await Promise.all([refreshCartPanel(), refreshCartBadge()]);
+      await cartAction(form.action, new FormData(form));
       openCart();
       showToast({ type: 'success', title: 'Añadido al carrito', message: productName });
     } finally {
@@ -0,0 +1,153 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from models import db, Producto, Categoria
+from catalog_cache import catalog_version
+from search_index import normalize
+
+# Sugerencias del buscador mientras se escribe (/search/suggest). Índice en
+# memoria por proceso: listas ordenadas de (clave, id) donde la clave es el
+# nombre normalizado (sin acentos, casefold) desde el comienzo de cada
+# palabra, así "luna" sugiere "Collar Luna Negra". Buscar un prefijo es un
+# bisect + recorrer las claves que empiezan con él.
+#
+# - Se arma al arrancar (SUGGEST_PRELOAD) con productos activos y categorías.
+# - El admin aplica el cambio de un producto en el índice de su worker sin
+#   reconstruir (update_product/remove_product).
+# - Los demás workers (y cambios masivos o de categorías) lo notan por la
+#   versión del catálogo: la consulta que lo ve dispara una reconstrucción
+#   en un hilo aparte (una sola por proceso) y sigue respondiendo con el
+#   índice anterior hasta que el nuevo está listo. Solo el primer armado,
+#   sin nada que servir, bloquea.
+
+log = logging.getLogger(__name__)
+
+
+def _keys(nombre):
+    name = " ".join(normalize(nombre).split())
+    keys = [name]
+    for i, ch in enumerate(name):
+        if ch == " ":
+            keys.append(name[i + 1:])
+    return keys
+
+
+def _matches(keys, prefix, limit):
+    found = []
+    i = bisect_left(keys, (prefix,))
+    while i < len(keys) and len(found) < limit and keys[i][0].startswith(prefix):
+        item_id = keys[i][1]
+        if item_id not in found:
+            found.append(item_id)
+        i += 1
+    return found
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()  # una reconstrucción a la vez
+        self.version = None
+        self._products = []  # [(clave, id)] ordenada
+        self._product_names = {}
+        self._categories = []
+        self._category_info = {}  # id -> (nombre, slug)
+
+    def rebuild(self):
+        version = catalog_version()
+        products = db.session.execute(
+            select(Producto.id, Producto.nombre).where(Producto.activo.is_(True))
+        ).all()
+        categories = db.session.execute(select(Categoria.id, Categoria.nombre, Categoria.slug)).all()
+        product_keys = sorted((key, pid) for pid, nombre in products for key in _keys(nombre))
+        category_keys = sorted((key, cid) for cid, nombre, _ in categories for key in _keys(nombre))
+        with self._lock:
+            self._products = product_keys
+            self._product_names = {pid: nombre for pid, nombre in products}
+            self._categories = category_keys
+            self._category_info = {cid: (nombre, slug) for cid, nombre, slug in categories}
+            self.version = version
+
+    def _rebuild_in_background(self):
+        if not self._rebuild_lock.acquire(blocking=False):
+            return  # ya hay una en curso
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self.rebuild()
+            except Exception:
+                log.exception("No se pudo reconstruir el índice de sugerencias")
+            finally:
+                self._rebuild_lock.release()
+
+        threading.Thread(target=run, name="suggest-rebuild", daemon=True).start()
+
+    def _synced(self, version):
+        # Si nadie más cambió el catálogo entre medio, el índice queda al día
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+
+    def _remove_keys(self, pid):
+        nombre = self._product_names.pop(pid, None)
+        if nombre is None:
+            return
+        for key in _keys(nombre):
+            i = bisect_left(self._products, (key, pid))
+            if i < len(self._products) and self._products[i] == (key, pid):
+                del self._products[i]
+
+    def update_product(self, pid, nombre, activo, version):
+        """Aplica un alta/edición; ``version`` es la que devolvió el bump."""
+        with self._lock:
+            self._remove_keys(pid)
+            if activo:
+                self._product_names[pid] = nombre
+                for key in _keys(nombre):
+                    insort(self._products, (key, pid))
+            self._synced(version)
+
+    def remove_product(self, pid, version):
+        with self._lock:
+            self._remove_keys(pid)
+            self._synced(version)
+
+    def suggest(self, query, limit=8):
+        """{"categorias": [(nombre, slug)], "productos": [(id, nombre)]}."""
+        if self.version is None:
+            with self._rebuild_lock:
+                if self.version is None:
+                    self.rebuild()
+        elif self.version != catalog_version():
+            self._rebuild_in_background()
+        prefix = " ".join(normalize(query).split())
+        if not prefix:
+            return {"categorias": [], "productos": []}
+        with self._lock:
+            categories = [self._category_info[cid] for cid in _matches(self._categories, prefix, 3)]
+            products = [
+                (pid, self._product_names[pid])
+                for pid in _matches(self._products, prefix, limit - len(categories))
+            ]
+        return {"categorias": categories, "productos": products}
+
+
+suggest_index = SuggestIndex()
+
+
+def init_suggest(app):
+    app.config.setdefault("SUGGEST_PRELOAD", True)
+    app.config.setdefault("SUGGEST_LIMIT", 8)
+    if not app.config["SUGGEST_PRELOAD"]:
+        return
+    with app.app_context():
+        try:
+            suggest_index.rebuild()
+        except OperationalError as exc:
+            db.session.rollback()
+            # Base sin migrar (p. ej. antes de `flask db-upgrade`): se arma al primer uso
+            log.warning("No se pudo precargar el índice de sugerencias: %s", exc)
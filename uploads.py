@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+import time
+from flask import current_app
+from sqlalchemy import select
+from images import derivative_dir, source_images
+from models import db, Producto
+
+# Fotos de productos guardadas por contenido: el nombre es el SHA-256 del
+# archivo, así que dos subidas iguales terminan en el mismo archivo y no hace
+# falta probar nombres libres (name-1, name-2...) ni coordinar workers.
+#
+# La subida se copia al disco en bloques mientras se hashea (nunca entera en
+# memoria), a un temporal en la misma carpeta, y se mueve con os.replace
+# (atómico). El tamaño lo limita MAX_CONTENT_LENGTH antes de leer el cuerpo.
+#
+# Estructura: static/img/u/<2 primeros hex>/<sha256>.<ext>; Producto.imagen
+# guarda esa ruta relativa. Las imágenes que ningún producto referencia se
+# borran con `flask gc-uploads`.
+
+STORE_DIR = "u"
+TMP_PREFIX = ".upload-"
+
+
+def store_upload(file_storage, ext):
+    """Guarda la subida; devuelve (ruta relativa para Producto.imagen, ya existía)."""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    chunk_size = current_app.config["UPLOAD_CHUNK_SIZE"]
+    store = os.path.join(folder, STORE_DIR)
+    os.makedirs(store, exist_ok=True)
+
+    digest = hashlib.sha256()
+    tmp = tempfile.NamedTemporaryFile(dir=store, prefix=TMP_PREFIX, delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = file_storage.stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+        name = digest.hexdigest()
+        relative = f"{STORE_DIR}/{name[:2]}/{name}.{ext.lower()}"
+        target = os.path.join(folder, relative)
+        try:
+            # Ya estaba: se renueva el mtime para que gc-uploads (min_age)
+            # no la borre antes de que se guarde el producto que la usa
+            os.utime(target)
+            os.remove(tmp.name)
+            return relative, True
+        except FileNotFoundError:
+            pass  # no existía (o el gc la acaba de borrar): se guarda esta copia
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp.name, target)
+        return relative, False
+    except BaseException:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+
+
+def _referenced(names):
+    return set(
+        db.session.execute(select(Producto.imagen).where(Producto.imagen.in_(names))).scalars()
+    )
+
+
+def collect_garbage(min_age=3600, dry_run=False):
+    """Borra del store las imágenes sin producto (y sus derivados); devuelve las rutas.
+
+    ``min_age`` (segundos) protege subidas recientes cuyo producto todavía
+    no se guardó.
+    """
+    folder = current_app.config["UPLOAD_FOLDER"]
+    store = os.path.join(folder, STORE_DIR)
+    if not os.path.isdir(store):
+        return []
+    now = time.time()
+    candidates = [
+        f"{STORE_DIR}/{name}".replace(os.sep, "/")
+        for name in source_images(store)
+        if now - os.path.getmtime(os.path.join(store, name)) >= min_age
+    ]
+    referenced = set(db.session.execute(select(Producto.imagen).distinct()).scalars())
+    unreferenced = [name for name in candidates if name not in referenced]
+    # Releer justo antes de borrar: un producto pudo tomar la imagen mientras tanto
+    orphans = []
+    for start in range(0, len(unreferenced), 500):
+        batch = unreferenced[start:start + 500]
+        taken = _referenced(batch)
+        orphans += [name for name in batch if name not in taken]
+    if dry_run:
+        return orphans
+    _remove_stale_temps(store, now - min_age)
+    for name in orphans:
+        path = os.path.join(folder, name)
+        os.remove(path)
+        if not os.listdir(os.path.dirname(path)):
+            os.rmdir(os.path.dirname(path))
+        derivatives = derivative_dir(folder, name)
+        if os.path.isdir(derivatives):
+            for entry in os.scandir(derivatives):
+                os.remove(entry.path)
+            os.rmdir(derivatives)
+    return orphans
+
+
+def _remove_stale_temps(store, cutoff):
+    # Temporales de subidas que se cortaron a la mitad (worker reiniciado)
+    for entry in os.scandir(store):
+        if entry.name.startswith(TMP_PREFIX) and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+
+
+def init_uploads(app):
+    app.config.setdefault("UPLOAD_CHUNK_SIZE", 64 * 1024)
+    app.config.setdefault("MAX_CONTENT_LENGTH", 32 * 1024 * 1024)
+